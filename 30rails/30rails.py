@@ -7,9 +7,15 @@ game 30 Rails by Julian Anstey
 """
 
 from argparse import ArgumentParser
-from copy import deepcopy
+from collections import namedtuple
+from copy import copy
 from enum import Enum
+from multiprocessing import Pool
+import json
+import os
 import random
+import statistics
+import time
 
 
 __author__ = "Joshua Wong"
@@ -46,6 +52,85 @@ class Cell:
             self.edges = tuple(map(tuple, edges))
 
 
+def get_track_edges(track, flip=False, rotate=0):
+    """ get the edges of a track """
+    edges = []
+    if track in {1, 3, 5, 6}:
+        edges += [[Way.S, Way.E], [Way.E, Way.S]]
+    if track in {2, 4, 6}:
+        edges += [[Way.N, Way.S], [Way.S, Way.N]]
+    if track == 3:
+        edges += [[Way.N, Way.W], [Way.W, Way.N]]
+    if track == 4:
+        edges += [[Way.W, Way.E], [Way.E, Way.W]]
+    if track == 5:
+        edges += [[Way.W, Way.S], [Way.S, Way.W]]
+
+    if flip:
+        for edge in edges:
+            for i in range(2):
+                if edge[i].value % 2:
+                    edge[i] = Way((edge[i].value+2) % 4)
+
+    if rotate:
+        for edge in edges:
+            for i in range(2):
+                edge[i] = Way((edge[i].value+rotate) % 4)
+
+    return tuple(map(tuple, edges))
+
+
+# every cell a board can hold; boards store each cell as a byte indexing these
+CELLS = [Cell(Tile.BORDER), Cell(Tile.EMPTY), Cell(Tile.MOUNTAIN),
+         Cell(Tile.MINE, [[Way(i)] for i in range(4)])]
+CELLS += [Cell(station, [[way]]) for station in (Tile.STATION1, Tile.STATION2,
+                                                 Tile.STATION3, Tile.STATION4)
+                                 for way in Way]
+CELLS += [Cell(Tile.TRACK, get_track_edges(track, flip, rotate))
+          for track in range(1, 7) for flip in (False, True) for rotate in range(4)]
+
+CODES = {}                                  # byte of each (tile, edges)
+for code, cell in enumerate(CELLS):
+    CODES.setdefault((cell.tile, cell.edges), code)
+BORDER = CODES[(Tile.BORDER, None)]
+EMPTY = CODES[(Tile.EMPTY, None)]
+TILES = [cell.tile for cell in CELLS]       # tile of each byte
+EDGES = [cell.edges for cell in CELLS]      # edges of each byte
+NODES = bytes(sum(1 << way.value for way in {edge[0] for edge in cell.edges or ()})
+              for cell in CELLS)            # ways the edges of each byte travel
+
+CellView = namedtuple('CellView', ['tile', 'edges'])
+VIEWS = [CellView(cell.tile, cell.edges) for cell in CELLS]  # immutable cell of each byte
+
+
+class GameState:
+    __slots__ = ('_cells', '_width')
+    def __init__(self, cells, width):
+        """ initialise an immutable view of a packed board, indexed like the
+            grid with state[y][x] """
+        self._cells = cells     # bytes of the board
+        self._width = width     # width of a row
+
+    def __getitem__(self, y):
+        """ get a row of cells """
+        if not 0 <= y < self._width:
+            raise IndexError("row {} is not on the board".format(y))
+        return tuple(VIEWS[code] for code in self._cells[y*self._width:(y+1)*self._width])
+
+    def __len__(self):
+        return self._width
+
+    def __eq__(self, other):
+        return isinstance(other, GameState) and self._cells == other._cells
+
+    def __hash__(self):
+        return hash(self._cells)
+
+    def to_bytes(self):
+        """ get the packed board """
+        return self._cells
+
+
 class Game:
     def __init__(self, size=6, demo=False, verbose=False):
         """ initialise an empty board """
@@ -56,10 +141,10 @@ class Game:
         self._mine = None                   # position of the mine
         self._station = {}                  # positions of the stations
         self._bonus = None                  # position of the bonus
-        self._curr_src = None               # source for scoring
-        self._curr_dst = None               # destination for scoring
         self._n_connected_mines = 0         # number of stations connected to the mine
         self._score = 0                     # final score
+        self._connections = {}              # shortest path and frontier of each connection searched
+        self._state = None                  # snapshot of the grid since the last placement
 
         self._white = None                  # value of the white die
         self._black = None                  # value of the black die
@@ -72,26 +157,23 @@ class Game:
 
         # for scoring
         self._scoring = {(1, 2): 1, (1, 3): 2, (1, 4): 3, (2, 3): 3, (2, 4): 4, (3, 4): 5,
-                         1: 2, 2: 6, 3: 12, 4: 20}
+                         0: 0, 1: 2, 2: 6, 3: 12, 4: 20}
 
-        # empty grid
-        self._grid = [[Cell(Tile.BORDER) for _ in range(size+2)]]
+        # empty grid, packed row by row into a byte per cell
+        self._width = size+2
+        self._grid = bytearray([BORDER]) * self._width**2
         for y in range(1, size+1):
-            self._grid.append([Cell(Tile.BORDER)])
-            for x in range(1, size+1):
-                self._grid[y].append(Cell(Tile.EMPTY))
-            self._grid[y].append(Cell(Tile.BORDER))
-        self._grid.append([Cell(Tile.BORDER) for _ in range(size+2)])
+            self._grid[y*self._width+1:y*self._width+size+1] = bytes([EMPTY]) * size
 
 
     def _is_empty(self, y, x):
         """ check if a cell is empty """
-        return self._grid[y][x].tile is Tile.EMPTY
+        return self._grid[y*self._width+x] == EMPTY
 
 
     def _is_type(self, y, x, tile):
         """ check if a cell is of a given tile type """
-        return self._grid[y][x].tile is tile
+        return TILES[self._grid[y*self._width+x]] is tile
 
 
     def _check_border(self, y, x):
@@ -99,7 +181,7 @@ class Game:
         assert ((y == 0 or y == self._size+1) and 1 <= x <= self._size) or \
                ((x == 0 or x == self._size+1) and 1 <= y <= self._size),   \
                "({}, {}) is not on the border".format(x, y)
-        assert self._grid[y][x].tile is Tile.BORDER, "the cell is already occupied"
+        assert self._grid[y*self._width+x] == BORDER, "the cell is already occupied"
 
 
     def _check_grid(self, y, x):
@@ -113,8 +195,16 @@ class Game:
         """ set a cell to be a given tile """
         assert isinstance(tile, Tile), "{} is not a tile instance".format(tile)
 
-        self._grid[y][x] = Cell(tile, edges)
+        if edges is not None:
+            edges = tuple(map(tuple, edges))
+        self._grid[y*self._width+x] = CODES[(tile, edges)]
         self._curr_round += 1
+        self._state = None
+
+        # search again for the connections that could extend into the cell
+        for key, (path, frontier) in list(self._connections.items()):
+            if (y, x) in frontier:
+                del self._connections[key]
 
         if self._verbose:
             print("[{}] Placing a {} at ({}, {})".format(
@@ -135,10 +225,10 @@ class Game:
         """ set a cell to be a mine """
         self._check_grid(y, x)
         assert self._mine is None, "a mine already exists"
-        assert self._grid[y-1][x].tile is Tile.MOUNTAIN or \
-               self._grid[y+1][x].tile is Tile.MOUNTAIN or \
-               self._grid[y][x-1].tile is Tile.MOUNTAIN or \
-               self._grid[y][x+1].tile is Tile.MOUNTAIN,   \
+        assert self._is_type(y-1, x, Tile.MOUNTAIN) or \
+               self._is_type(y+1, x, Tile.MOUNTAIN) or \
+               self._is_type(y, x-1, Tile.MOUNTAIN) or \
+               self._is_type(y, x+1, Tile.MOUNTAIN),   \
                "the mine is not beside a mountain"
 
         self._set_cell(y, x, Tile.MINE, [[Way(i)] for i in range(4)])
@@ -200,30 +290,7 @@ class Game:
             else:
                 assert track == self._black, "the track does not match the die-roll"
 
-        edges = []
-        if track in {1, 3, 5, 6}:
-            edges += [[Way.S, Way.E], [Way.E, Way.S]]
-        if track in {2, 4, 6}:
-            edges += [[Way.N, Way.S], [Way.S, Way.N]]
-        if track == 3:
-            edges += [[Way.N, Way.W], [Way.W, Way.N]]
-        if track == 4:
-            edges += [[Way.W, Way.E], [Way.E, Way.W]]
-        if track == 5:
-            edges += [[Way.W, Way.S], [Way.S, Way.W]]
-
-        if flip:
-            for edge in edges:
-                for i in range(2):
-                    if edge[i].value % 2:
-                        edge[i] = Way((edge[i].value+2) % 4)
-
-        if rotate:
-            for edge in edges:
-                for i in range(2):
-                    edge[i] = Way((edge[i].value+rotate) % 4)
-
-        self._set_cell(y, x, Tile.TRACK, tuple(map(tuple, edges)))
+        self._set_cell(y, x, Tile.TRACK, get_track_edges(track, flip, rotate))
 
 
     def _get_bonus(self, path):
@@ -236,48 +303,128 @@ class Game:
 
     def _get_edges(self, y, x):
         """ get the edges of a cell """
-        return self._grid[y][x].edges
+        return EDGES[self._grid[y*self._width+x]]
 
 
     def _has_node(self, y, x, way):
         """ check if an edge travels a given way"""
-        edges = self._get_edges(y, x)
-        if edges is not None:
-            for edge in edges:
-                if edge[0] is way:
-                    return True
-        return False
-
-
-    def _trace(self, y, x, prev_edge, path=[], paths=[]):
-        """ trace a path between a given source and its destination """
-        src, dst = self._curr_src, self._curr_dst
-        subpath = (y, x, *sorted(x.value for x in prev_edge))  # path signature
-
-        if (y, x) == dst:
-            paths.append(path)  # completed path from source to destination
-
-        elif (y, x) == src or (self._is_type(y, x, Tile.TRACK) and subpath not in path):
-            # to prevent loopbacks
-            if (y, x) != src:
-                path.append(subpath)
-            # trace all possible edges
-            edges = self._get_edges(y, x)
-            if edges is not None:
-                for edge in edges:
-                    if (edge[0].value+2) % 4 == prev_edge[-1].value or (y, x) == src:
-
-                        if   edge[-1] is Way.N and self._has_node(y-1, x, Way.S):
-                            self._trace(y-1, x, edge, deepcopy(path), paths)
-
-                        elif edge[-1] is Way.E and self._has_node(y, x+1, Way.W):
-                            self._trace(y, x+1, edge, deepcopy(path), paths)
-
-                        elif edge[-1] is Way.S and self._has_node(y+1, x, Way.N):
-                            self._trace(y+1, x, edge, deepcopy(path), paths)
-
-                        elif edge[-1] is Way.W and self._has_node(y, x-1, Way.E):
-                            self._trace(y, x-1, edge, deepcopy(path), paths)
+        return NODES[self._grid[y*self._width+x]] >> way.value & 1 == 1
+
+
+    _steps = ((-1, 0), (0, 1), (1, 0), (0, -1))   # (dy, dx) of each way
+
+
+    def _get_neighbour(self, y, x, way):
+        """ get the cell an edge leaving a given way connects to, if any """
+        dy, dx = self._steps[way.value]
+        if self._has_node(y+dy, x+dx, Way((way.value+2) % 4)):
+            return y+dy, x+dx
+        return None
+
+
+    def _connect(self, src, dst, bonus=False, frontier=None):
+        """ find the shortest path between a source and its destination with a
+            BFS over track states, choosing among the shortest paths the first
+            in the order of the edges, or with bonus, one through the bonus
+            cell if there is any; the empty cells the search runs into are
+            added to frontier
+
+            each cell on a path is recorded as its position and the ways of
+            the edge that led into it, and no such signature may be repeated;
+            two different cells can lead into a cell with the same signature,
+            so a state also holds those of such signatures the path has used """
+        # moves out of each (cell, entry side) the source reaches, in the
+        # order of the edges, and the cells each signature is entered from
+        moves = {(*src, None): []}
+        entered = {}
+        queue = list(moves)
+        for node in queue:
+            y, x, entry = node
+            for edge in self._get_edges(y, x):
+                if entry is not None and edge[0].value != entry:
+                    continue
+                cell = self._get_neighbour(y, x, edge[-1])
+                if cell is None and frontier is not None:
+                    dy, dx = self._steps[edge[-1].value]
+                    if self._is_empty(y+dy, x+dx):
+                        frontier.add((y+dy, x+dx))
+                if cell == dst:
+                    moves[node].append((None, None))
+                elif cell is not None and self._is_type(*cell, Tile.TRACK):
+                    succ = (*cell, (edge[-1].value+2) % 4)
+                    signature = (*cell, *sorted(way.value for way in edge))
+                    moves[node].append((succ, signature))
+                    entered.setdefault(signature, set()).add((y, x))
+                    if succ not in moves:
+                        moves[succ] = []
+                        queue.append(succ)
+        shared = {signature for signature, cells in entered.items() if len(cells) > 1}
+
+        # successors of each state reachable from the source, in the order of the edges
+        start = (*src, None, False, frozenset())    # (y, x, entry side, passed the bonus,
+                                                    #  shared signatures used)
+        successors = {}
+        predecessors = {}
+        queue = [start]
+        for state in queue:
+            y, x, entry, passed, used = state
+            successors[state] = []
+            for node, signature in moves[(y, x, entry)]:
+                if node is None:
+                    succ = ('dst', passed)
+                elif signature in used:
+                    continue
+                else:
+                    succ = (*node, passed or (bonus and node[:2] == self._bonus),
+                            used | {signature} if signature in shared else used)
+                successors[state].append((succ, signature))
+                if succ not in predecessors:
+                    predecessors[succ] = []
+                    if succ[0] != 'dst':
+                        queue.append(succ)
+                predecessors[succ].append(state)
+
+        # number of steps from each state to the destination
+        def get_distances(targets):
+            distances = {target: 0 for target in targets if target in predecessors}
+            queue = list(distances)
+            for state in queue:
+                for pred in predecessors.get(state, ()):
+                    if pred not in distances:
+                        distances[pred] = distances[state] + 1
+                        queue.append(pred)
+            return distances
+
+        distances = get_distances([('dst', False), ('dst', True)])
+        if start not in distances:
+            return None
+        if bonus:
+            via_bonus = get_distances([('dst', True)])
+            if via_bonus.get(start) == distances[start]:
+                distances = via_bonus
+
+        # follow the first shortest edge out of each state; as each step gets
+        # closer to the destination, no state is entered twice, and as a
+        # shortest path has no loop to cut, no signature is repeated
+        path, state = [], start
+        while state[0] != 'dst':
+            for succ, signature in successors[state]:
+                if distances.get(succ) == distances[state] - 1:
+                    break
+            if succ[0] != 'dst':
+                path.append(signature)
+            state = succ
+
+        return path
+
+
+    def _get_connection(self, src, dst):
+        """ get the shortest path between a source and its destination, only
+            searching again once a cell on its frontier has been set """
+        if (src, dst) not in self._connections:
+            frontier = set()
+            self._connections[(src, dst)] = (self._connect(src, dst, frontier=frontier), frontier)
+        return self._connections[(src, dst)][0]
 
 
     def is_over(self):
@@ -314,9 +461,38 @@ class Game:
         return self._valid_placements
 
 
+    def current_score(self):
+        """ get the score the game would end with now """
+        score = 0
+        for i in range(1, 4):
+            for j in range(i+1, 5):
+                if i in self._station and j in self._station:
+                    path = self._get_connection(self._station[i], self._station[j])
+                    if path is not None:
+                        score += self._scoring[(i, j)] + len(path) + self._get_bonus(path)
+
+        if self._mine is not None:
+            score += self._scoring[sum(self._get_connection(self._station[i], self._mine) is not None
+                                       for i in self._station)]
+        return score
+
+
     def get_game_state(self):
-        """ get the current state of the game """
-        return deepcopy(self._grid)
+        """ get an immutable snapshot of the grid, shared until the next
+            placement """
+        if self._state is None:
+            self._state = GameState(bytes(self._grid), self._width)
+        return self._state
+
+
+    def fork(self):
+        """ get a copy of the game to play on independently, sharing
+            everything that is never changed in place """
+        game = copy(self)
+        game._grid = bytearray(self._grid)
+        game._station = dict(self._station)
+        game._connections = dict(self._connections)  # paths and frontiers are replaced, not changed
+        return game
 
 
     def roll_dice(self):
@@ -335,7 +511,8 @@ class Game:
         n_mountains = 0
 
         for y in range(1, self._size+1):
-            if y - n_mountains < 2 and random.randint(0, 1):
+            # skip a row, the last one if no other has been
+            if y - n_mountains < 2 and (random.randint(0, 1) or y == self._size):
                 continue
 
             self.set_mountain(y, random.randint(1, self._size))
@@ -344,7 +521,7 @@ class Game:
         # seed the game with a mine
         mountains_pos = [(y, x) for y in range(1, self._size+1)
                                 for x in range(1, self._size+1)
-                                if self._grid[y][x].tile is Tile.MOUNTAIN]
+                                if self._is_type(y, x, Tile.MOUNTAIN)]
 
         mines_pos = [(y+dy, x+dx) for y, x in mountains_pos
                                   for dy, dx in [(-1, 0), (1, 0),
@@ -384,48 +561,55 @@ class Game:
     def display(self):
         """ display the board """
         print()
-        for row in self._grid:
-            print('  ' + ' '.join(cell.tile.value for cell in row))
+        for y in range(self._width):
+            row = self._grid[y*self._width:(y+1)*self._width]
+            print('  ' + ' '.join(TILES[code].value for code in row))
         print()
 
 
-    def end(self):
-        """ compute the final score and end the game """
+    def get_scores(self, bonus=False):
+        """ get the [connection, shortest path, bonus] score of each pair of
+            stations and whether each station is connected to the mine """
         # for connecting stations
+        pairs = {}
         for i in range(1, 4):
             for j in range(i+1, 5):
-                self._curr_src, self._curr_dst = self._station[i], self._station[j]
-                y, x = self._curr_src
-                paths = []
-                self._trace(y, x, self._grid[y][x].edges[0], paths=paths)
-
-                if len(paths) != 0:
-                    shortest_path = min(paths, key=len)
-                    score = [self._scoring[(i, j)],             # score for connection
-                             len(shortest_path),                # score for the shortest path
-                             self._get_bonus(shortest_path)]    # score bonus
-                    self._score += sum(score)
+                src, dst = self._station[i], self._station[j]
+                shortest_path = self._connect(src, dst, bonus) if bonus else self._get_connection(src, dst)
 
+                if shortest_path is not None:
+                    pairs[(i, j)] = [self._scoring[(i, j)],             # score for connection
+                                     len(shortest_path),                # score for the shortest path
+                                     self._get_bonus(shortest_path)]    # score bonus
                 else:
-                    score = [0, 0, 0]
-
-                if self._verbose:
-                    print("[Scoring] {}->{}".format(i, j),
-                          "  {:>2} = {:>2} + {:>2} + {:>2}".format(sum(score), *score))
+                    pairs[(i, j)] = [0, 0, 0]
 
         # for connecting stations to the mine
-        for i in range(1, 5):
-            self._curr_src, self._curr_dst = self._station[i], self._mine
-            y, x = self._curr_src
-            paths = []
-            self._trace(y, x, self._grid[y][x].edges[0], paths=paths)
+        mines = {i: self._get_connection(self._station[i], self._mine) is not None
+                 for i in range(1, 5)}
+
+        return pairs, mines
 
-            if len(paths) != 0:
+
+    def end(self, bonus=False):
+        """ compute the final score and end the game; with bonus, score the
+            shortest connections through the bonus cell when there are any """
+        pairs, mines = self.get_scores(bonus)
+
+        for (i, j), score in pairs.items():
+            self._score += sum(score)
+
+            if self._verbose:
+                print("[Scoring] {}->{}".format(i, j),
+                      "  {:>2} = {:>2} + {:>2} + {:>2}".format(sum(score), *score))
+
+        for i, connected in mines.items():
+            if connected:
                 self._n_connected_mines += 1
 
             if self._verbose:
                 print("[Scoring] {}->{}  ".format(i, Tile.MINE.value),
-                        "\u2714" if len(paths) != 0 else "\u2718")
+                        "\u2714" if connected else "\u2718")
 
         self._score += self._scoring[self._n_connected_mines]  # score for the mine
 
@@ -433,19 +617,128 @@ class Game:
         print("[Scoring] TOTAL {:>3}".format(self._score))
 
 
+def random_placement(game, placements, black):
+    """ places the rolled track on a random valid cell in a random
+        orientation """
+    return (*random.choice(placements), black, random.randint(0, 1), random.randint(0, 3))
+
+
+def greedy_placement(game, placements, black):
+    """ places the rolled track where it raises the live score the most,
+        breaking ties randomly """
+    best, best_key = None, None
+    for y, x in placements:
+        for flip in range(2):
+            for rotate in range(4):
+                fork = game.fork()
+                fork.set_track(y, x, black, flip, rotate)
+                key = (fork.current_score(), random.random())
+                if best_key is None or key > best_key:
+                    best, best_key = (y, x, black, flip, rotate), key
+    return best
+
+
+# placement policies by name, each a function from a game, the cells the
+# white die allows and the track the black die shows to the (y, x, track,
+# flip, rotate) placement to play; placing elsewhere or another track uses an
+# override
+POLICIES = {'random': random_placement, 'greedy': greedy_placement}
+CHUNKSIZE = 16      # games sent to a worker at once; a random game takes ~1 ms
+
+
+def play(task):
+    """ play a game without printing and get its scores """
+    name, game_id, seed = task
+    policy = POLICIES[name]
+    random.seed(seed)   # the game's own stream, whichever worker plays it
+
+    game = Game()
+    game.randomise_setup()
+    game.start()
+    while not game.is_over():
+        white, black = game.roll_dice()
+        placements = game.get_empty_cells(white)
+        y, x, track, flip, rotate = policy(game, placements, black)
+        game.set_track(y, x, track, flip, rotate,
+                       white_override=(y, x) not in placements,
+                       black_override=track != black)
+
+    pairs, mines = game.get_scores()
+    n_mines = sum(mines.values())
+    result = {'policy': name, 'game': game_id, 'seed': seed,
+              'connections': sum(score[0] for score in pairs.values()),
+              'path_lengths': sum(score[1] for score in pairs.values()),
+              'bonus': sum(score[2] for score in pairs.values()),
+              'mine': game._scoring[n_mines],
+              'connected_pairs': sum(score[0] > 0 for score in pairs.values()),
+              'connected_mines': n_mines}
+    result['score'] = result['connections'] + result['path_lengths'] + \
+                      result['bonus'] + result['mine']
+    return result
+
+
+def simulate(args):
+    """ play games over a process pool, streaming their scores to a file and
+        printing their distributions """
+    policies = args.policy or ['random']
+    rng = random.Random(args.seed)
+    seeds = [rng.getrandbits(64) for _ in range(args.games)]
+    tasks = [(name, game_id, seed)
+             for game_id, seed in enumerate(seeds) for name in policies]
+
+    components = ['score', 'connections', 'path_lengths', 'bonus', 'mine']
+    results = {name: {component: [] for component in components} for name in policies}
+    start = time.perf_counter()
+    with Pool(args.processes) as pool, open(args.output, 'w') as fo:
+        for result in pool.imap_unordered(play, tasks, CHUNKSIZE):
+            fo.write(json.dumps(result) + '\n')
+            for component in components:
+                results[result['policy']][component].append(result[component])
+    elapsed = time.perf_counter() - start
+
+    for name in policies:
+        scores = sorted(results[name]['score'])
+        quantiles = [scores[int(q * (len(scores)-1))] for q in (0, 0.05, 0.25, 0.5, 0.75, 0.95, 1)]
+        print("{} ({} games)".format(name, len(scores)))
+        print("  score        mean {:>6.2f}  stdev {:>6.2f}  ".format(
+              statistics.mean(scores), statistics.pstdev(scores)) +
+              "min/5/25/50/75/95/max {}".format('/'.join(map(str, quantiles))))
+        for component in components[1:]:
+            print("  {:<12} mean {:>6.2f}".format(component, statistics.mean(results[name][component])))
+    print("{} games in {:.1f}s ({:,.0f} games/min) on {} processes".format(
+          len(tasks), elapsed, len(tasks) / elapsed * 60, args.processes))
+
+
 if __name__ == '__main__':
     parser = ArgumentParser()
     parser.add_argument('--seed', default=None, type=int,
-                        help="seed for a deterministic game")
+                        help="seed for a deterministic game, or for the setups "
+                             "of the simulated games")
     parser.add_argument('--size', default=6, type=int,
                         help="size of the board; default is 6")
     parser.add_argument('--demo', action='store_true',
                         help="run in demo mode")
+    subparsers = parser.add_subparsers(dest='command')
+    simulate_parser = subparsers.add_parser('simulate', help="play games silently and summarise their scores")
+    simulate_parser.add_argument('-n', '--games', default=1000, type=int,
+                                 help="number of setups each policy plays; default is 1000")
+    simulate_parser.add_argument('-p', '--policy', action='append', choices=sorted(POLICIES),
+                                 help="where to place the rolled tracks; may be repeated to "
+                                      "compare policies on the same setups; default is random")
+    simulate_parser.add_argument('-j', '--processes', default=os.cpu_count(), type=int,
+                                 help="number of games played at once; default is the number of CPUs")
+    simulate_parser.add_argument('-o', '--output', default='results.jsonl',
+                                 help="file each game's scores are written to; default is results.jsonl")
     args = parser.parse_args()
 
     assert args.size >= 6, "the board size must be at least 6x6"
 
-    if args.demo:
+    if args.command == 'simulate':
+        if args.size != 6:
+            parser.error("simulate only plays the 6x6 game")
+        simulate(args)
+
+    elif args.demo:
         random.seed(0)
 
         game = Game()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+""" tests of the 30 Rails scoring, run with pytest """
+
+import importlib.util
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+
+PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '30rails.py')
+spec = importlib.util.spec_from_file_location('rails', PATH)
+rails = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(rails)
+
+
+def trace(game, src, dst, bonus=False):
+    """ find the shortest path between a source and its destination by
+        tracing every path that never repeats a cell signature, as the game
+        first scored connections """
+    paths = []
+
+    def visit(y, x, prev_edge, path):
+        subpath = (y, x, *sorted(way.value for way in prev_edge))
+        if (y, x) == dst:
+            paths.append(path)
+        elif (y, x) == src or (game._is_type(y, x, rails.Tile.TRACK) and subpath not in path):
+            if (y, x) != src:
+                path = path + [subpath]
+            for edge in game._get_edges(y, x):
+                if (edge[0].value+2) % 4 == prev_edge[-1].value or (y, x) == src:
+                    cell = game._get_neighbour(y, x, edge[-1])
+                    if cell is not None:
+                        visit(*cell, edge, path)
+
+    visit(*src, game._get_edges(*src)[0], [])
+    if len(paths) == 0:
+        return None
+    return min(paths, key=lambda path: (len(path), -bonus*game._get_bonus(path)))
+
+
+def random_game(seed, rounds=None, policy=rails.random_placement):
+    """ get a game set up from a seed and played with a placement policy for
+        a number of rounds or to the end """
+    random.seed(seed)
+    game = rails.Game()
+    game.randomise_setup()
+    game.start()
+    while not game.is_over() and rounds != 0:
+        white, black = game.roll_dice()
+        placements = game.get_empty_cells(white)
+        game.set_track(*policy(game, placements, black))
+        if rounds is not None:
+            rounds -= 1
+    return game
+
+
+def get_connections(game):
+    """ get the source and destination of each connection scored """
+    return [(game._station[i], game._station[j]) for i in range(1, 4) for j in range(i+1, 5)] + \
+           [(game._station[i], game._mine) for i in range(1, 5)]
+
+
+def test_demo():
+    """ the demo game scores as it always has """
+    result = subprocess.run([sys.executable, PATH, '--demo'], capture_output=True,
+                            encoding='utf-8', check=True)
+    assert [line for line in result.stdout.splitlines() if line.startswith("[Scoring]")] == [
+        "[Scoring] 1->2    8 =  1 +  7 +  0",
+        "[Scoring] 1->3    8 =  2 +  4 +  2",
+        "[Scoring] 1->4   11 =  3 +  8 +  0",
+        "[Scoring] 2->3   11 =  3 +  6 +  2",
+        "[Scoring] 2->4   10 =  4 +  6 +  0",
+        "[Scoring] 3->4    0 =  0 +  0 +  0",
+    ] + ["[Scoring] {}->{}   \u2714".format(i, rails.Tile.MINE.value) for i in range(1, 5)] + [
+        "[Scoring] TOTAL  68",
+    ]
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_connect(seed):
+    """ the shortest paths are the ones traced exhaustively """
+    game = random_game(seed)
+    for src, dst in get_connections(game):
+        for bonus in (False, True):
+            assert game._connect(src, dst, bonus) == trace(game, src, dst, bonus)
+
+
+@pytest.mark.parametrize('seed, policy, pairs, mines', [
+    (148, rails.random_placement, [2, 0, 0, 0, 0, 0], [True, False, False, False]),
+    (237, rails.random_placement, [0, 3, 0, 0, 0, 0], [False, False, False, True]),
+    (1, rails.greedy_placement, [0, 0, 0, 0, 0, 0], [False, False, False, True]),
+    (2, rails.greedy_placement, [0, 0, 0, 0, 6, 0], [False, False, False, False]),
+    (3, rails.greedy_placement, [0, 3, 0, 0, 0, 0], [False, False, False, False]),
+])
+def test_scores(seed, policy, pairs, mines):
+    """ the score of each connection on a few boards """
+    scores = random_game(seed, policy=policy).get_scores()
+    assert [sum(score) for score in scores[0].values()] == pairs
+    assert list(scores[1].values()) == mines
+
+
+def test_crossing():
+    """ a path may not enter a cell from two cells through edges of the same
+        ways, even when they take different lines of a crossing """
+    game = random_game(15948894104834562890)
+    assert game._connect(game._station[3], game._mine) is None
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_current_score(seed):
+    """ the live score is always the score the game would end with """
+    for rounds in (0, 10, 20, None):
+        game = random_game(seed, rounds)
+        score = game.current_score()
+        game.end()
+        assert game._score == score
+
+
+def test_fork():
+    """ a fork is played on without changing the game it was forked from """
+    game = random_game(0, rounds=10)
+    state, score = game.get_game_state(), game.current_score()
+    connections = dict(game._connections)
+
+    fork = game.fork()
+    while not fork.is_over():
+        white, black = fork.roll_dice()
+        fork.set_track(*rails.random_placement(fork, fork.get_empty_cells(white), black))
+    fork.end()
+
+    assert game.get_game_state() == state
+    assert game.current_score() == score
+    assert game._connections == connections
+    assert fork.get_game_state() != state
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+""" benchmarks for the PONG clone """
+
+from argparse import ArgumentParser
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')  # render off screen
+from main import *
+from spectate import Spectators
+from vecenv import VecPong
+import numpy as np
+import tempfile
+import time
+
+
+def benchVecPong(n, steps, seed):
+    """ game-steps per second of a batch of games """
+    games = VecPong(n, seed)
+    rng = np.random.default_rng(seed)
+    inputs = rng.random((16, 4, n)) < 0.5
+    points = 0
+    start = time.perf_counter()
+    for i in range(steps):
+        points += np.count_nonzero(games.step(*inputs[i % len(inputs)]))
+        if i % 64 == 0:  # restart the games that are over
+            games.reset(np.flatnonzero(games.over))
+    elapsed = time.perf_counter() - start
+
+    print("[vecenv] {:>12,.0f} game-steps/s ({} games, {} points)".format(
+          n * steps / elapsed, n, points))
+
+
+def benchDisplay(frames, seed):
+    """ frame time of the game display during random play """
+    random.seed(seed)
+    pygame.init()
+    display = Display(EventHandler())
+    P1, P2 = Player(1), Player(2)
+    ball = Ball(0)
+
+    elapsed = 0
+    for _ in range(frames):
+        P1.update(random.random() < 0.3, random.random() < 0.3)
+        P2.update(random.random() < 0.3, random.random() < 0.3)
+        ball.sweep(P1, P2)
+        P1_lost, P2_lost = P1.lose(ball), P2.lose(ball)
+        if P1_lost or P2_lost:
+            ball = Ball(P1.score + P2.score)
+
+        start = time.perf_counter()
+        display.currentGameState(P1, P2, ball)
+        elapsed += time.perf_counter() - start
+
+    print("[display] {:>10.1f} us/frame ({:,.0f} FPS)".format(
+          elapsed / frames * 1e6, frames / elapsed))
+
+
+class Recorder(object):
+    """ spectators keeping every state instead of streaming them """
+    def __init__(self):
+        self.states = [(0,) * Spectators.FIELDS]
+
+    def broadcast(self, P1, P2, ball):
+        self.states.append((P1.top, P2.top, ball.left, ball.top, P1.score, P2.score))
+
+
+def benchSpectators(viewers, steps, seed):
+    """ cost per step of streaming a headless game to many viewers, checking
+        that each of them decodes the game's final state """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'pong.sock')
+        elapsed = []
+        for streamed in (False, True):
+            if streamed:
+                spectators = Spectators(path)
+                socks = [Spectators.connect(path) for _ in range(viewers)]
+                while len(spectators.viewers) < viewers:  # wait for them to be accepted
+                    time.sleep(0.01)
+            random.seed(seed)
+            game = Game({1: 'hard', 2: 'normal'}, display=False, spectators=streamed and spectators)
+            start = time.perf_counter()
+            n = game.simulate(steps)
+            elapsed.append(time.perf_counter() - start)
+        spectators.close()
+
+        expected = (game.P1.top, game.P2.top, game.Ball.left, game.Ball.top, game.P1.score, game.P2.score)
+        for sock in socks:
+            data, chunk = b'', True
+            while chunk:
+                chunk = sock.recv(1 << 16)
+                data += chunk
+            state, i = (0,) * Spectators.FIELDS, 0
+            while i < len(data):
+                state, i = Spectators.decode(data, i, state)
+            assert state == expected
+            sock.close()
+
+    random.seed(seed)
+    recorder = Recorder()
+    Game({1: 'hard', 2: 'normal'}, display=False, spectators=recorder).simulate(steps)
+    size = sum(len(Spectators.encode(*pair)) for pair in zip(recorder.states, recorder.states[1:]))
+
+    print("[spectate] {:>7.2f} us/step streaming to {} viewers, {:.2f} bytes/step/viewer "
+          "({:.2f} sent as steps were coalesced)".format(
+          (elapsed[1] - elapsed[0]) / n * 1e6, viewers, size / n, len(data) / n))
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('-n', default=10000, type=int,
+                        help="number of games; default is 10000")
+    parser.add_argument('--steps', default=1000, type=int,
+                        help="number of steps; default is 1000")
+    parser.add_argument('--seed', default=0, type=int,
+                        help="seed for the random workload; default is 0")
+    args = parser.parse_args()
+
+    benchVecPong(args.n, args.steps, args.seed)
+    benchDisplay(args.steps * 10, args.seed)
+    benchSpectators(100, args.steps * 10, args.seed)
@@ -1,10 +1,13 @@
 import json
+import os
 
 """ initialise game variables """
-with open('pong.ini', 'r') as fi:
+with open(os.path.join(os.path.dirname(__file__), 'pong.ini'), 'r') as fi:
     init = json.load(fi)
 
 FPS = init['FPS'] # frames per second
+PHYSICSRATE = init['physics_rate'] # physics steps per second
+PHYSICSSTEP = 1/PHYSICSRATE # seconds per physics step
 WINWIDTH, WINHEIGHT = init['window_size'] # window's width and height
 HALFWINWIDTH, HALFWINHEIGHT = int(WINWIDTH/2), int(WINHEIGHT/2)
 XMARGIN, YMARGIN = init['margins']
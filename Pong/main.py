@@ -9,6 +9,10 @@ import random
 import sys
 import time
 
+# reaction delay in physics steps and maximum aiming error in pixels
+DIFFICULTIES = {'easy': (20, 40), 'normal': (10, 25), 'hard': (4, 15), 'perfect': (0, 0)}
+WAITTIMEOUT = 1000  # ms to block for events on screens where nothing moves
+
 
 class Ball(pygame.Rect):
     """ ball object """
@@ -25,19 +29,17 @@ class Ball(pygame.Rect):
         else:  # starts towards P1
             self.vx = -MINBALLVELX**2 / abs(self.vy)
 
-    def update(self, P1, P2):
-        """ resolve collisions and move the ball """
-        if self.top <= 0 or self.bottom >= WINHEIGHT:
-            self.vy = -self.vy  # change vertical velocity
-        elif self.colliderect(P1):
-            self.vy += P1.vy  # adjust horizontal and vertical velocity
-            self.vx = MINBALLVELX**2 / abs(self.vy) if self.vy != 0 else MAXBALLVELX
-            self.left = P1.right  # prevent overlap
-        elif self.colliderect(P2):
-            self.vy += P2.vy  # adjust horizontal and vertical velocity
-            self.vx = -MINBALLVELX**2 / abs(self.vy) if self.vy != 0 else MAXBALLVELX
-            self.right = P2.left  # prevent overlap
+        self.pos = [float(self.left), float(self.top)]  # exact position
+        self.last_pos = list(self.pos)  # position before the last step
+
+    def lerp(self, alpha):
+        """ get the ball's rect between its last and current positions """
+        return pygame.Rect(round(self.last_pos[0]*(1 - alpha) + self.pos[0]*alpha),
+                           round(self.last_pos[1]*(1 - alpha) + self.pos[1]*alpha),
+                           BALLSIZE, BALLSIZE)
 
+    def clamp(self):
+        """ keep the ball's velocity within its limits """
         if abs(self.vx) < MINBALLVELX:  # make sure the game doesn't slow down
             self.vx = self.vx / abs(self.vx) * MINBALLVELX
         if abs(self.vx) > MAXBALLVELX:  # make sure the ball's x velocity doesn't go crazy
@@ -45,7 +47,51 @@ class Ball(pygame.Rect):
         if abs(self.vy) > MAXBALLVELY:  # make sure the ball's y velocity doesn't go crazy
             self.vy = self.vy / abs(self.vy) * MAXBALLVELY
 
-        self.move_ip(self.vx, self.vy)  # move the ball
+    def bounce(self, player):
+        """ bounce off a player, taking on some of its vertical velocity """
+        direction = 1 if player.player == 1 else -1  # away from the player
+        self.vy += player.vy
+        self.vx = direction * (MINBALLVELX**2 / abs(self.vy) if self.vy != 0 else MAXBALLVELX)
+        self.pos[0] = player.right if player.player == 1 else player.left - BALLSIZE  # prevent overlap
+        self.clamp()
+
+    def sweep(self, P1, P2):
+        """ move the ball through a step, resolving its collisions with the
+            walls and players at the exact times they happen """
+        self.last_pos = list(self.pos)
+        self.clamp()
+        for player in (P1, P2):  # a player has moved onto the ball
+            if self.colliderect(player):
+                self.bounce(player)
+
+        time_left = 1.0
+        for __ in range(8):  # bounces per step
+            x, y = self.pos
+            hits = []  # time of each collision within the step
+            if self.vy < 0:  # top wall
+                hits.append((-y / self.vy, None))
+            elif self.vy > 0:  # bottom wall
+                hits.append(((WINHEIGHT - BALLSIZE - y) / self.vy, None))
+            if self.vx < 0 and x >= P1.right:  # P1's face
+                hits.append(((P1.right - x) / self.vx, P1))
+            elif self.vx > 0 and x + BALLSIZE <= P2.left:  # P2's face
+                hits.append(((P2.left - BALLSIZE - x) / self.vx, P2))
+
+            hits = [(t, player) for (t, player) in hits if 0 <= t <= time_left and
+                    (player is None or player.top - BALLSIZE < y + self.vy*t < player.bottom)]
+            if not hits:
+                break
+            t, player = min(hits, key=lambda hit: hit[0])
+            self.pos = [x + self.vx*t, y + self.vy*t]
+            time_left -= t
+            if player is None:
+                self.vy = -self.vy  # change vertical velocity
+            else:
+                self.bounce(player)
+
+        self.pos[0] += self.vx*time_left  # move the ball
+        self.pos[1] += self.vy*time_left
+        self.left, self.top = round(self.pos[0]), round(self.pos[1])
 
 
 class Player(pygame.Rect):
@@ -61,8 +107,14 @@ class Player(pygame.Rect):
         self.width = PLAYERWIDTH
         self.height = PLAYERHEIGHT
         self.vy = 0  # not moving
+        self.last_top = self.top  # top before the last step
         self.score = 0
 
+    def lerp(self, alpha):
+        """ get the player's rect between its last and current positions """
+        return pygame.Rect(self.left, round(self.last_top*(1 - alpha) + self.top*alpha),
+                           self.width, self.height)
+
     def update(self, move_up, move_down):
         """ move the player given inputs """
         if (move_up and move_down) or not (move_up or move_down):  # gridlock or no movement
@@ -77,6 +129,7 @@ class Player(pygame.Rect):
                 if self.vy > MAXPLAYERVELY:  # maximum velocity
                     self.vy = MAXPLAYERVELY
 
+        self.last_top = self.top
         self.move_ip(0, self.vy)  # move the player
 
         if self.top <= 0:  # hit the top
@@ -99,6 +152,52 @@ class Player(pygame.Rect):
         return False
 
 
+class Computer(object):
+    """ computer controlling a player """
+    def __init__(self, player, difficulty='normal', rng=random):
+        """ initialise the computer's prediction, drawing its errors from rng """
+        self.player = player  # controlled player
+        self.delay, self.error = DIFFICULTIES[difficulty]
+        self.rng = rng
+        self.ball, self.vx = None, None  # ball and velocity last predicted for
+        self.target = HALFWINHEIGHT  # where to move the player's centre
+        self.next_target = HALFWINHEIGHT  # target once the computer has reacted
+        self.wait = 0  # steps before reacting
+        self.predictions = 0
+
+    def predict(self, ball):
+        """ predict the ball's centre when it reaches the player, solving the
+            reflections off the walls in closed form """
+        if self.player.player == 1:
+            distance = ball.vx < 0 and (ball.pos[0] - self.player.right) / -ball.vx
+        else:
+            distance = ball.vx > 0 and (self.player.left - BALLSIZE - ball.pos[0]) / ball.vx
+        if not distance or distance < 0:  # going away or past the player
+            return HALFWINHEIGHT  # wait in the middle
+
+        span = WINHEIGHT - BALLSIZE  # range of the ball's top
+        y = (ball.pos[1] + ball.vy*distance) % (2*span)  # unfold the reflections
+        if y > span:
+            y = 2*span - y
+        return y + BALLSIZE/2 + self.rng.uniform(-self.error, self.error)
+
+    def update(self, ball):
+        """ get the computer's (move_up, move_down) inputs, only predicting
+            again when the ball's velocity has changed """
+        if ball is not self.ball or ball.vx != self.vx:  # a serve or a hit
+            self.ball, self.vx = ball, ball.vx
+            self.next_target = self.predict(ball)
+            self.wait = self.delay
+            self.predictions += 1
+        if self.wait:
+            self.wait -= 1
+        else:
+            self.target = self.next_target
+
+        centre = self.player.centery
+        return centre > self.target + PLAYERHEIGHT/4, centre < self.target - PLAYERHEIGHT/4
+
+
 class Text(pygame.Rect):
     """ text object """
     def __init__(self, text, size, color, bg=None):
@@ -131,16 +230,21 @@ class EventHandler(object):
                 self.terminate()
             pygame.event.post(event)
 
-    def getEvent(self, event_type, key=None):
-        """ check for specific event """
-        for event in pygame.event.get(event_type):
-            if key is not None and event.key == key:
-                return True
-            elif key == None:
-                pygame.event.clear()
-                return True
-            pygame.event.post(event)
-        return False
+    def waitForKey(self, key):
+        """ sleep until key is released, handling quit events and redrawing
+            the screen only when the window needs it """
+        while True:
+            event = pygame.event.wait(WAITTIMEOUT)
+            if event.type == QUIT:
+                self.terminate()
+            elif event.type == KEYUP:
+                if event.key == K_ESCAPE:
+                    self.terminate()
+                if event.key == key:
+                    pygame.event.clear()
+                    return
+            elif event.type in (VIDEOEXPOSE, WINDOWEXPOSED):
+                pygame.display.update()
 
     def getEvents(self):
         """ event handling """
@@ -175,19 +279,32 @@ class Display(object):
         self.FPSClock = pygame.time.Clock()
         self.Surf = pygame.display.set_mode((WINWIDTH, WINHEIGHT))
         self.Input = input
-        
+
+        self.Background = self.Surf.copy()  # pre-baked field
+        self.Background.fill(BGCOLOR)
+        for i in range(int(WINHEIGHT/20)):  # draw dotted line in the middle
+            pygame.draw.line(self.Background, FGCOLOR, (HALFWINWIDTH, i*20+5), (HALFWINWIDTH, i*20+15), 2)
+        self.Static = self.Background.copy()  # field and scores
+        self.Scores = [None, None]  # cached score texts
+        self.Rects = None  # rects drawn in the last frame, None after another screen
+
+    def getScores(self, P1_score, P2_score):
+        """ get the score texts, only rendering the scores that changed """
+        for (i, score, x) in ((0, P1_score, HALFWINWIDTH/2), (1, P2_score, HALFWINWIDTH/2*3)):
+            if self.Scores[i] is None or self.Scores[i].score != score:
+                self.Scores[i] = Text(str(score).zfill(2), BIGFONTSIZE, FGCOLOR)
+                self.Scores[i].center = (x, YMARGIN)
+                self.Scores[i].score = score
+        return self.Scores
+
     def displayScores(self, P1_score, P2_score):
         """ display scores """
-        P1_score = Text(str(P1_score).zfill(2), BIGFONTSIZE, FGCOLOR)
-        P1_score.center = (HALFWINWIDTH/2, YMARGIN)
-        P2_score = Text(str(P2_score).zfill(2), BIGFONTSIZE, FGCOLOR)
-        P2_score.center = (HALFWINWIDTH/2*3, YMARGIN)
-
-        self.Surf.blit(P1_score.Surf, P1_score)
-        self.Surf.blit(P2_score.Surf, P2_score)
+        for score in self.getScores(P1_score, P2_score):
+            self.Surf.blit(score.Surf, score)
 
     def titleScreen(self):
         """ display title screen """
+        self.Rects = None
         self.Surf.fill(BGCOLOR)
 
         title = Text("PONG", HUGEFONTSIZE, FGCOLOR)
@@ -199,31 +316,42 @@ class Display(object):
         self.Surf.blit(start.Surf, start)
         pygame.display.update()
 
-        while True:
-            self.Input.checkForQuit()
-            if self.Input.getEvent(KEYUP, K_RETURN):
-                pygame.event.clear()
-                return
-            self.FPSClock.tick(FPS)
+        self.Input.waitForKey(K_RETURN)
             
-    def currentGameState(self, P1, P2, ball):
-        """ display current game state """
-        self.Surf.fill(BGCOLOR)  # draw the background
-        for i in range(int(WINHEIGHT/20)):  # draw dotted line in the middle
-            pygame.draw.line(self.Surf, FGCOLOR, (HALFWINWIDTH, i*20+5), (HALFWINWIDTH, i*20+15), 2)
-        self.Surf.fill(FGCOLOR, P1)  # draw P1
-        self.Surf.fill(FGCOLOR, P2)  # draw P2
-        self.Surf.fill(FGCOLOR, ball)  # draw the ball
-        self.displayScores(P1.score, P2.score)
-        pygame.display.update()
+    def currentGameState(self, P1, P2, ball, alpha=1):
+        """ display current game state, with the objects drawn a fraction alpha
+            of the way through the last step, updating only what has changed """
+        old_scores = list(self.Scores)
+        scores = self.getScores(P1.score, P2.score)
+        changed = [i for i in range(2) if scores[i] is not old_scores[i]]
+        if self.Rects is None or changed:  # bake the new scores
+            self.Static.blit(self.Background, (0, 0))
+            for score in scores:
+                self.Static.blit(score.Surf, score)
+
+        if self.Rects is None:  # redraw everything
+            self.Surf.blit(self.Static, (0, 0))
+            dirty = [self.Surf.get_rect()]
+        else:  # erase the scores that changed and the last frame's objects
+            dirty = [old_scores[i] for i in changed] + [scores[i] for i in changed]
+            dirty += self.Rects
+            for rect in dirty:
+                self.Surf.blit(self.Static, rect, rect)
+
+        # draw P1, P2 and the ball, keeping the rects actually filled
+        self.Rects = [self.Surf.fill(FGCOLOR, rect.lerp(alpha)) for rect in (P1, P2, ball)]
+        for rect in self.Rects:
+            for score in scores:  # the scores are drawn on top
+                overlap = score.clip(rect)
+                if overlap:
+                    self.Surf.blit(score.Surf, overlap, overlap.move(-score.left, -score.top))
+        pygame.display.update(dirty + self.Rects)
 
     def gameOverScreen(self, P1_score, P2_score):
         """ display game over screen """
         pygame.event.clear()
-        self.Surf.fill(BGCOLOR)
-
-        for i in range(int(WINHEIGHT/20)):  # draw dotted line in the middle
-            pygame.draw.line(self.Surf, FGCOLOR, (HALFWINWIDTH, i*20+5), (HALFWINWIDTH, i*20+15), 2)
+        self.Rects = None
+        self.Surf.blit(self.Background, (0, 0))
 
         self.displayScores(P1_score, P2_score)
 
@@ -245,46 +373,65 @@ class Display(object):
 
         pygame.display.update()
 
-        while True:
-            self.Input.checkForQuit()
-            if self.Input.getEvent(KEYUP, K_RETURN):
-                pygame.event.clear()
-                return
-            self.FPSClock.tick(FPS)
+        self.Input.waitForKey(K_RETURN)
 
 
 class Game(object):
     """ game object """
-    def __init__(self):
-        """ initialise game variables """
+    def __init__(self, computers=None, display=True, spectators=None):
+        """ initialise game variables, with the difficulty of the computer
+            playing each of the players in computers, streaming each step to
+            spectators """
+        computers = computers or {}
         self.max_points = MAXPOINTS
         self.shame_limit = SHAMELIMIT
         self.P1 = Player(1)
         self.P2 = Player(2)
+        self.Computers = {player.player: Computer(player, computers[player.player])
+                          for player in (self.P1, self.P2) if player.player in computers}
         self.Input = EventHandler()
-        self.Display = Display(self.Input)
+        self.Display = Display(self.Input) if display else None
+        self.Spectators = spectators
+
+    def step(self, moving=True):
+        """ step the physics, return if someone loses the round """
+        inputs = {1: (self.Input.P1MOVEUP, self.Input.P1MOVEDOWN),
+                  2: (self.Input.P2MOVEUP, self.Input.P2MOVEDOWN)}
+        for (player, computer) in self.Computers.items():
+            inputs[player] = computer.update(self.Ball)
+
+        self.P1.update(*inputs[1])  # move P1
+        self.P2.update(*inputs[2])  # move P2
+        if moving:
+            self.Ball.sweep(self.P1, self.P2)  # move the ball
+
+        P1_lost = self.P1.lose(self.Ball)
+        P2_lost = self.P2.lose(self.Ball)
+        if self.Spectators:
+            self.Spectators.broadcast(self.P1, self.P2, self.Ball)
+        return P1_lost or P2_lost
 
     def startRound(self, i):
         """ start a round of pong """
         self.Ball = Ball(i)
-        self.start_time = time.time()
+        self.start_time = last_time = time.time()
+        lag = 0  # time not yet simulated
 
         while True:  # round loop
             self.Input.checkForQuit()
             self.Input.getEvents()
 
-            self.P1.update(self.Input.P1MOVEUP, self.Input.P1MOVEDOWN)  # move P1
-            self.P2.update(self.Input.P2MOVEUP, self.Input.P2MOVEDOWN)  # move P2
-            if time.time() - self.start_time > 2:
-                self.Ball.update(self.P1, self.P2)  # move the ball
-
-            self.Display.currentGameState(self.P1, self.P2, self.Ball)
-
-            P1_lost = self.P1.lose(self.Ball)
-            P2_lost = self.P2.lose(self.Ball)
-            if P1_lost or P2_lost:  # end the round if someone loses
-                return
-
+            # step the physics at a fixed rate, whatever the frame rate
+            now = time.time()
+            lag = min(lag + now - last_time, 0.25)  # don't spiral when too slow
+            last_time = now
+            while lag >= PHYSICSSTEP:
+                lag -= PHYSICSSTEP
+                if self.step(now - self.start_time > 2):  # end the round if someone loses
+                    return
+
+            # draw between the last two steps
+            self.Display.currentGameState(self.P1, self.P2, self.Ball, lag / PHYSICSSTEP)
             self.Display.FPSClock.tick(FPS)
 
     def run(self):
@@ -293,21 +440,42 @@ class Game(object):
 
         for i in range(self.max_points * 2):  # play a max of (MAXPOINTS * 2 - 1) rounds
             self.startRound(i)
-            if abs(self.P1.score - self.P2.score) >= self.shame_limit or \
-               self.max_points in (self.P1.score, self.P2.score):  # max score or shame limit reached
+            if self.isOver():
                 break  # end game
 
         self.Display.gameOverScreen(self.P1.score, self.P2.score)
 
+    def isOver(self):
+        """ check if the max score or shame limit is reached """
+        return abs(self.P1.score - self.P2.score) >= self.shame_limit or \
+            self.max_points in (self.P1.score, self.P2.score)
+
+    def simulate(self, max_steps=10**6):
+        """ play this game headless at full speed, return the steps taken """
+        steps = 0
+        for i in range(self.max_points * 2):
+            self.Ball = Ball(i)
+            start = steps
+            while steps < max_steps:
+                steps += 1
+                if self.step(steps - start > 2*PHYSICSRATE):  # after the pause
+                    break
+            if self.isOver() or steps >= max_steps:
+                break
+        return steps
+
 
 if __name__ == '__main__':
     parser = ArgumentParser(description='[Player 1] W / S, [Player 2] ↑ / ↓')
+    parser.add_argument('--cpu', action='append', type=int, choices=[1, 2], default=[],
+                        help="let the computer play a player; may be repeated")
+    parser.add_argument('--difficulty', default='normal', choices=list(DIFFICULTIES),
+                        help="difficulty of the computer; default is normal")
     args = parser.parse_args()
 
     pygame.init()
     pygame.display.set_caption('PONG')
 
     while True:  # main game loop
-        game = Game()
+        game = Game({player: args.difficulty for player in args.cpu})
         game.run()
-
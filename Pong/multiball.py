@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+""" PONG with many balls at once, as a stress test of the physics and
+    rendering """
+
+from argparse import ArgumentParser
+from itertools import repeat
+from main import *
+from vecenv import sweep
+import numpy as np
+
+COUNTS = [100, 300, 1000, 3000, 10000]  # ball counts of the stress test
+
+
+class Balls(object):
+    """ balls stored in arrays, with the rules of Ball.sweep resolved for
+        all of them at once """
+    def __init__(self, n, seed=None):
+        """ initialise every ball at the centre """
+        self.n = n
+        self.rng = np.random.default_rng(seed)
+        self.x = np.empty(n)  # exact lefts
+        self.y = np.empty(n)  # exact tops
+        self.vx = np.empty(n)
+        self.vy = np.empty(n)
+        self.serve(np.arange(n))
+
+    def serve(self, index):
+        """ start balls from the centre like Ball.__init__, in either direction """
+        n = len(index)
+        self.x[index] = HALFWINWIDTH - BALLSIZE/2
+        self.y[index] = self.rng.integers(0, WINHEIGHT - BALLSIZE, n, endpoint=True)
+        vy = self.rng.choice([-1, 1], n) * self.rng.integers(MINBALLVELY, MAXBALLVELY, n, endpoint=True)
+        self.vx[index] = self.rng.choice([-1, 1], n) * MINBALLVELX**2 / np.abs(vy)
+        self.vy[index] = vy
+
+    def update(self, P1, P2):
+        """ move every ball through a step, scoring and serving the balls that
+            leave the window """
+        sweep(self.x, self.y, self.vx, self.vy, P1.top, P1.vy, P2.top, P2.vy)
+        left = np.round(self.x)  # rounded like Ball.sweep
+        P1_points, P2_points = left >= WINWIDTH, left + BALLSIZE <= 0
+        P1.score += int(np.count_nonzero(P1_points))
+        P2.score += int(np.count_nonzero(P2_points))
+        self.serve(np.flatnonzero(P1_points | P2_points))
+
+    def track(self, player):
+        """ get the inputs that move a player towards the nearest ball coming
+            at it """
+        if player.player == 1:
+            coming, distance = self.vx < 0, self.x - player.right
+        else:
+            coming, distance = self.vx > 0, player.left - self.x
+        distance = np.where(coming & (distance > -BALLSIZE), distance, np.inf)
+        if not self.n or np.isinf(distance.min()):
+            return False, False
+        target = self.y[distance.argmin()] + BALLSIZE/2
+        return player.centery > target + PLAYERHEIGHT/4, player.centery < target - PLAYERHEIGHT/4
+
+
+class MultiDisplay(Display):
+    """ display drawing every ball from a cached sprite """
+    def __init__(self, input):
+        Display.__init__(self, input)
+        self.Sprite = pygame.Surface((BALLSIZE, BALLSIZE)).convert()
+        self.Sprite.fill(FGCOLOR)
+
+    def drawBalls(self, P1, P2, balls):
+        """ draw the field, the players and every ball in one batch """
+        old_scores = list(self.Scores)
+        scores = self.getScores(P1.score, P2.score)
+        if self.Rects is None or \
+           any(scores[i] is not old_scores[i] for i in range(2)):  # bake the new scores
+            self.Static.blit(self.Background, (0, 0))
+            for score in scores:
+                self.Static.blit(score.Surf, score)
+        self.Rects = [P1, P2]  # everything is redrawn each frame anyway
+
+        self.Surf.blit(self.Static, (0, 0))
+        self.Surf.fill(FGCOLOR, P1)
+        self.Surf.fill(FGCOLOR, P2)
+        dests = np.stack((balls.x, balls.y), 1).round().astype(int).tolist()
+        self.Surf.blits(zip(repeat(self.Sprite), dests), False)
+        pygame.display.update()
+
+
+def stress(counts, frames, display, seed):
+    """ print the physics and drawing time of a frame as the number of balls
+        goes up """
+    print("{:>8} {:>14} {:>14} {:>10}".format("balls", "physics ms", "drawing ms", "FPS"))
+    for n in counts:
+        P1, P2 = Player(1), Player(2)
+        balls = Balls(n, seed)
+        physics = drawing = 0
+        for _ in range(frames):
+            display.Input.checkForQuit()
+            start = time.perf_counter()
+            P1.update(*balls.track(P1))
+            P2.update(*balls.track(P2))
+            balls.update(P1, P2)
+            drawn = time.perf_counter()
+            display.drawBalls(P1, P2, balls)
+            physics += drawn - start
+            drawing += time.perf_counter() - drawn
+        print("{:>8} {:>14.3f} {:>14.3f} {:>10.0f}".format(
+              n, physics / frames * 1e3, drawing / frames * 1e3, frames / (physics + drawing)))
+
+
+def play(n, cpu, display, seed):
+    """ play with n balls until quitting, showing the frame rate """
+    P1, P2 = Player(1), Player(2)
+    balls = Balls(n, seed)
+    while True:
+        display.Input.checkForQuit()
+        display.Input.getEvents()
+        inputs = {1: (display.Input.P1MOVEUP, display.Input.P1MOVEDOWN),
+                  2: (display.Input.P2MOVEUP, display.Input.P2MOVEDOWN)}
+        for player in cpu:
+            inputs[player] = balls.track(P1 if player == 1 else P2)
+        P1.update(*inputs[1])
+        P2.update(*inputs[2])
+        balls.update(P1, P2)
+        display.drawBalls(P1, P2, balls)
+        display.FPSClock.tick(FPS)
+        pygame.display.set_caption('PONG x{} ({:.0f} FPS)'.format(n, display.FPSClock.get_fps()))
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='[Player 1] W / S, [Player 2] ↑ / ↓')
+    parser.add_argument('-n', '--balls', default=1000, type=int,
+                        help="number of balls; default is 1000")
+    parser.add_argument('--cpu', action='append', type=int, choices=[1, 2], default=[],
+                        help="let the computer play a player; may be repeated")
+    parser.add_argument('--stress', nargs='*', type=int, metavar='BALLS',
+                        help="time frames at each number of balls instead of playing; "
+                             "default is {}".format(' '.join(map(str, COUNTS))))
+    parser.add_argument('--frames', default=300, type=int,
+                        help="frames timed at each number of balls; default is 300")
+    parser.add_argument('--seed', default=None, type=int,
+                        help="seed of the serves")
+    args = parser.parse_args()
+
+    pygame.init()
+    pygame.display.set_caption('PONG')
+    display = MultiDisplay(EventHandler())
+    if args.stress is not None:
+        stress(args.stress or COUNTS, args.frames, display, args.seed)
+    else:
+        play(args.balls, args.cpu, display, args.seed)
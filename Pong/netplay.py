@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+""" PONG between two machines over UDP, exchanging only inputs and rolling
+    back to resimulate when a remote input arrives late """
+
+from argparse import ArgumentParser
+from main import *
+import asyncio
+import statistics
+import struct
+import zlib
+
+MAXROLLBACK = 15  # frames the game may run ahead of the remote inputs
+HELLO, INPUTS = 0, 1  # packet types
+HELLOPACKET = struct.Struct('<BQ')  # type, seed
+INPUTSPACKET = struct.Struct('<BIIdd')  # type, remote frames received, first frame, sent, echo
+UP, DOWN = 1, 2  # input bits
+
+
+class Peer(asyncio.DatagramProtocol):
+    """ UDP endpoint handing packets to a session """
+    def __init__(self, session):
+        self.session = session
+
+    def datagram_received(self, data, addr):
+        self.session.receive(data)
+
+
+class Session(object):
+    """ rollback session of a game, one player being local and the other
+        remote """
+    def __init__(self, player, port, peer, seed=0, delay=0, jitter=0, loss=0,
+                 difficulty=None, frames=None, display=True):
+        """ initialise the session, with artificial delay and jitter in
+            seconds and the rate of packet loss on outgoing packets """
+        self.local = player
+        self.port = port
+        self.peer = peer
+        self.seed = seed if player == 1 else None  # P2 gets P1's seed
+        self.delay, self.jitter, self.loss = delay, jitter, loss
+        self.rng = random.Random()  # network conditions
+        self.max_frames = frames
+
+        self.game = Game(display=display)
+        self.Keys = EventHandler()  # keyboard, while game.Input holds the simulated inputs
+        self.Computer = difficulty and Computer(self.game.P1 if player == 1 else self.game.P2,
+                                                difficulty, random.Random())
+        self.started = False
+        self.transport = None
+
+        self.frame = 0  # frames simulated
+        self.round = self.round_step = 0
+        self.over = False
+        self.inputs = []  # local inputs of each frame
+        self.remote = {}  # remote inputs of each frame received
+        self.confirmed = 0  # remote frames received without gaps
+        self.checked = 0  # frames simulated with confirmed remote inputs
+        self.used = {}  # remote inputs each unchecked frame was simulated with
+        self.snapshots = {}  # state before each unchecked frame
+        self.acked = 0  # local frames the peer has received
+        self.peer_sent = self.peer_sent_at = None  # last remote send time, for round trips
+
+        # stats
+        self.packets = [0, 0, 0]  # sent, dropped, received
+        self.rollbacks = self.resimulated = self.stalls = 0
+        self.latencies = []  # local input changes to screen, in seconds
+        self.lateness = []  # frames remote input changes arrived late
+        self.rtts = []
+
+    def send(self, data):
+        """ send a packet through the artificial network conditions """
+        self.packets[0] += 1
+        if self.rng.random() < self.loss:
+            self.packets[1] += 1
+        elif self.delay or self.jitter:
+            delay = self.delay + self.rng.uniform(0, self.jitter)  # may reorder packets
+            asyncio.get_running_loop().call_later(delay, self.transport.sendto, data, self.peer)
+        else:
+            self.transport.sendto(data, self.peer)
+
+    def sendHello(self):
+        self.send(HELLOPACKET.pack(HELLO, self.seed or 0))
+
+    def sendInputs(self):
+        """ send the local inputs the peer hasn't acknowledged """
+        now = time.perf_counter()
+        echo = self.peer_sent + now - self.peer_sent_at if self.peer_sent is not None else 0
+        self.send(INPUTSPACKET.pack(INPUTS, self.confirmed, self.acked, now, echo) +
+                  bytes(self.inputs[self.acked:]))
+
+    def receive(self, data):
+        """ handle a packet from the peer """
+        self.packets[2] += 1
+        if data[0] == HELLO:
+            if self.local == 2 and not self.started:
+                self.seed = HELLOPACKET.unpack(data)[1]
+                self.start()
+            elif self.local == 1:
+                self.sendHello()  # answer at once so the peer starts soon after
+                if not self.started:
+                    self.start()
+            return
+        if not self.started:
+            return
+
+        now = time.perf_counter()
+        __, acked, first, sent, echo = INPUTSPACKET.unpack_from(data)
+        self.acked = max(self.acked, acked)
+        if self.peer_sent is None or sent > self.peer_sent:
+            self.peer_sent, self.peer_sent_at = sent, now
+        if echo:
+            self.rtts.append(now - echo)
+
+        for (f, bits) in enumerate(data[INPUTSPACKET.size:], first):
+            if f >= self.confirmed and f not in self.remote:
+                self.remote[f] = bits
+                if f < self.frame and bits != self.remote.get(f - 1, 0):  # a change shown late
+                    self.lateness.append(self.frame - f)
+        while self.confirmed in self.remote:
+            self.confirmed += 1
+
+    def start(self):
+        """ start the game on the shared seed """
+        self.started = True
+        random.seed(self.seed)  # serves are drawn from the shared generator
+        self.game.Ball = Ball(0)
+
+    def getRemote(self, f):
+        """ get the remote inputs of a frame, predicting that unreceived
+            inputs are still held """
+        if f < self.confirmed:
+            return self.remote[f]
+        return self.remote[self.confirmed - 1] if self.confirmed else 0
+
+    def save(self):
+        """ get the state of the game """
+        P1, P2, ball = self.game.P1, self.game.P2, self.game.Ball
+        return ((P1.top, P1.vy, P1.last_top, P1.score),
+                (P2.top, P2.vy, P2.last_top, P2.score),
+                (ball.left, ball.top, ball.vx, ball.vy, tuple(ball.pos), tuple(ball.last_pos)),
+                self.round, self.round_step, self.over, random.getstate())
+
+    def load(self, state):
+        """ restore the state of the game """
+        P1, P2, ball = self.game.P1, self.game.P2, self.game.Ball
+        (P1.top, P1.vy, P1.last_top, P1.score), (P2.top, P2.vy, P2.last_top, P2.score), \
+            (ball.left, ball.top, ball.vx, ball.vy, pos, last_pos), \
+            self.round, self.round_step, self.over, rng = state
+        ball.pos, ball.last_pos = list(pos), list(last_pos)
+        random.setstate(rng)
+
+    def simulate(self):
+        """ simulate the next frame """
+        f = self.frame
+        self.snapshots[f] = self.save()
+        self.used[f] = remote = self.getRemote(f)
+        P1_bits, P2_bits = (self.inputs[f], remote) if self.local == 1 else (remote, self.inputs[f])
+        game = self.game
+        game.Input.P1MOVEUP, game.Input.P1MOVEDOWN = bool(P1_bits & UP), bool(P1_bits & DOWN)
+        game.Input.P2MOVEUP, game.Input.P2MOVEDOWN = bool(P2_bits & UP), bool(P2_bits & DOWN)
+
+        self.round_step += 1
+        if not self.over and game.step(self.round_step > 2*PHYSICSRATE):  # after the pause
+            if game.isOver():
+                self.over = True
+            else:
+                self.round += 1
+                game.Ball = Ball(self.round)
+                self.round_step = 0
+        self.frame += 1
+
+    def rollback(self):
+        """ resimulate from the first frame simulated with mispredicted
+            remote inputs, and forget the frames that can't be rolled back """
+        for f in range(self.checked, self.frame):
+            if self.getRemote(f) != self.used[f]:
+                self.load(self.snapshots[f])
+                end, self.frame = self.frame, f
+                while self.frame < end:
+                    self.simulate()
+                self.rollbacks += 1
+                self.resimulated += end - f
+                break
+
+        for f in range(self.checked, min(self.confirmed, self.frame)):
+            del self.snapshots[f], self.used[f]
+        self.checked = max(self.checked, min(self.confirmed, self.frame))
+
+    def getLocalInputs(self):
+        """ get the local player's inputs from the computer or either set of
+            keys """
+        if self.Computer:
+            move_up, move_down = self.Computer.update(self.game.Ball)
+        else:
+            move_up = self.Keys.P1MOVEUP or self.Keys.P2MOVEUP
+            move_down = self.Keys.P1MOVEDOWN or self.Keys.P2MOVEDOWN
+        return move_up*UP | move_down*DOWN
+
+    def isStopped(self):
+        """ check if the game has ended or reached the frame limit """
+        return self.over or self.frame == self.max_frames
+
+    def isDone(self):
+        """ check if both peers have every input of the ended game """
+        return self.isStopped() and self.confirmed >= self.frame and self.acked >= self.frame
+
+    def checkEvents(self):
+        if self.game.Display:
+            self.Keys.checkForQuit()
+            self.Keys.getEvents()
+
+    async def run(self):
+        """ connect to the peer and play the game at the physics rate """
+        loop = asyncio.get_running_loop()
+        self.transport, __ = await loop.create_datagram_endpoint(lambda: Peer(self),
+                                                                 local_addr=('0.0.0.0', self.port))
+        if self.game.Display:
+            waiting = Text("Waiting for player {}...".format(3 - self.local), SMALLFONTSIZE, FGCOLOR)
+            waiting.center = (HALFWINWIDTH, HALFWINHEIGHT)
+            self.game.Display.Surf.fill(BGCOLOR)
+            self.game.Display.Surf.blit(waiting.Surf, waiting)
+            pygame.display.update()
+        while not self.started:
+            self.checkEvents()
+            self.sendHello()
+            await asyncio.sleep(0.1)
+
+        next_time = time.perf_counter()
+        while not self.isDone():
+            self.checkEvents()
+            sampled = time.perf_counter()
+            self.rollback()
+            if self.isStopped():
+                pass
+            elif self.frame - self.confirmed >= MAXROLLBACK:  # wait for the peer
+                self.stalls += 1
+            else:
+                self.inputs.append(self.getLocalInputs())
+                changed = len(self.inputs) > 1 and self.inputs[-1] != self.inputs[-2]
+                self.simulate()
+                if self.game.Display:
+                    self.game.Display.currentGameState(self.game.P1, self.game.P2, self.game.Ball)
+                if changed:
+                    self.latencies.append(time.perf_counter() - sampled)
+            self.sendInputs()
+
+            next_time = max(next_time + PHYSICSSTEP, time.perf_counter() - PHYSICSSTEP)
+            await asyncio.sleep(next_time - time.perf_counter())
+
+        self.rollback()  # to the inputs received since the last frame
+        for __ in range(10):  # keep acknowledging in case the peer lost our last packets
+            self.sendInputs()
+            await asyncio.sleep(0.05)
+        self.transport.close()
+
+    def getChecksum(self):
+        """ get a checksum of the state, the same on both peers once done """
+        return zlib.crc32(repr(self.save()).encode())
+
+    def report(self):
+        """ print the session's latency and rollback stats """
+        def ms(values):
+            if not values:
+                return "n/a"
+            values = sorted(values)
+            return "mean {:.1f} ms, p95 {:.1f} ms".format(statistics.mean(values) * 1e3,
+                                                          values[int(len(values) * 0.95)] * 1e3)
+
+        print("P{} {} frames, score {}-{}, state checksum {:08x}".format(
+              self.local, self.frame, self.game.P1.score, self.game.P2.score, self.getChecksum()))
+        print("  local input to screen: {} ({} changes)".format(ms(self.latencies), len(self.latencies)))
+        print("  remote input to screen: {} + network ({} changes shown late)".format(
+              ms([frames * PHYSICSSTEP for frames in self.lateness]), len(self.lateness)))
+        print("  round trip: {}".format(ms(self.rtts)))
+        print("  {} rollbacks resimulating {} frames, {} stalls".format(
+              self.rollbacks, self.resimulated, self.stalls))
+        print("  packets: {} sent, {} dropped, {} received".format(*self.packets))
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='play PONG against another machine; W / S or ↑ / ↓')
+    parser.add_argument('player', type=int, choices=[1, 2],
+                        help="player to play; player 1 decides the seed")
+    parser.add_argument('--port', default=5005, type=int,
+                        help="local UDP port; default is 5005")
+    parser.add_argument('--peer', default='127.0.0.1:5006',
+                        help="peer's host:port; default is 127.0.0.1:5006")
+    parser.add_argument('--seed', default=0, type=int,
+                        help="seed of the serves, used by player 1; default is 0")
+    parser.add_argument('--delay', default=0, type=float,
+                        help="artificial delay of outgoing packets in ms; default is 0")
+    parser.add_argument('--jitter', default=0, type=float,
+                        help="maximum extra random delay in ms; default is 0")
+    parser.add_argument('--loss', default=0, type=float,
+                        help="rate of outgoing packets dropped; default is 0")
+    parser.add_argument('--cpu', default=None, choices=list(DIFFICULTIES), metavar='DIFFICULTY',
+                        help="let the computer play the local player, at a difficulty "
+                             "({})".format(', '.join(DIFFICULTIES)))
+    parser.add_argument('--frames', default=None, type=int,
+                        help="end the game after a number of frames")
+    parser.add_argument('--headless', action='store_true',
+                        help="don't open a window, for testing with --cpu")
+    args = parser.parse_args()
+
+    host, __, port = args.peer.rpartition(':')
+    pygame.init()
+    session = Session(args.player, args.port, (host, int(port)), args.seed,
+                      args.delay / 1e3, args.jitter / 1e3, args.loss, args.cpu,
+                      args.frames, not args.headless)
+    try:
+        asyncio.run(session.run())
+    finally:
+        session.report()
+    if session.over and session.game.Display and not args.cpu:
+        session.game.Display.gameOverScreen(session.game.P1.score, session.game.P2.score)
+    pygame.quit()
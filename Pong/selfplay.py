@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+""" headless matches between PONG computers over a process pool """
+
+from argparse import ArgumentParser
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')  # never open a window
+from main import *
+from multiprocessing import Pool
+
+
+def playMatch(task):
+    """ play a match and return the scores and steps taken """
+    difficulties, seed, max_steps = task
+    random.seed(seed)
+    game = Game({1: difficulties[0], 2: difficulties[1]}, display=False)
+    steps = game.simulate(max_steps)
+    return game.P1.score, game.P2.score, steps
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--matches', default=100, type=int,
+                        help="number of matches; default is 100")
+    parser.add_argument('--difficulty', nargs=2, default=['normal', 'normal'],
+                        choices=list(DIFFICULTIES), metavar=('P1', 'P2'),
+                        help="difficulty of each computer; default is normal normal")
+    parser.add_argument('--seed', default=0, type=int,
+                        help="seed of the seeds of the matches; default is 0")
+    parser.add_argument('--max-steps', default=100000, type=int,
+                        help="steps after which a match is a draw; default is 100000")
+    parser.add_argument('-j', '--processes', default=os.cpu_count(), type=int,
+                        help="number of worker processes; default is the number of cores")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    tasks = [(args.difficulty, rng.getrandbits(64), args.max_steps)
+             for _ in range(args.matches)]
+
+    wins, points, total_steps = [0, 0, 0], [0, 0], 0  # P1, P2, draws
+    start = time.perf_counter()
+    with Pool(args.processes) as pool:
+        for (P1_score, P2_score, steps) in pool.imap_unordered(playMatch, tasks):
+            wins[0 if P1_score > P2_score else 1 if P2_score > P1_score else 2] += 1
+            points[0] += P1_score
+            points[1] += P2_score
+            total_steps += steps
+    elapsed = time.perf_counter() - start
+
+    for (i, difficulty) in enumerate(args.difficulty):
+        print("P{} {:<8} {:>6} wins {:>8} points".format(i + 1, difficulty, wins[i], points[i]))
+    print("{} draws; {} matches in {:.1f}s ({:.1f} matches/s, {:,.0f} steps/s) on {} processes".format(
+          wins[2], args.matches, elapsed, args.matches / elapsed, total_steps / elapsed, args.processes))
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+""" PONG streamed to spectators as compact state deltas, and a viewer
+    drawing a streamed game """
+
+from argparse import ArgumentParser
+from main import *
+import os
+import queue
+import socket
+import threading
+
+MAXBACKLOG = 1 << 16  # bytes a spectator may fall behind before being dropped
+
+
+class Spectators(object):
+    """ viewers of a game, streamed the changes to its state over a TCP
+        (host:port) or Unix (path) socket """
+    FIELDS = 6  # P1's top, P2's top, ball's left and top, P1's and P2's scores
+
+    def __init__(self, address):
+        """ listen for viewers and start streaming to them """
+        self.server = self.getSocket(address)
+        if self.server.family == socket.AF_INET:
+            self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        elif os.path.exists(address):
+            os.remove(address)  # left by an earlier game
+        self.server.bind(self.parseAddress(address))
+        self.server.listen()
+        self.server.setblocking(False)
+
+        self.queue = queue.Queue()  # states of the steps to send
+        self.viewers = {}  # socket of each viewer: bytes not yet sent
+        self.state = (0,) * self.FIELDS  # last state sent
+        self.sent = 0  # bytes sent to all viewers
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def parseAddress(address):
+        if ':' in address:
+            host, __, port = address.rpartition(':')
+            return host, int(port)
+        return address
+
+    @staticmethod
+    def getSocket(address):
+        family = socket.AF_INET if ':' in address else socket.AF_UNIX
+        return socket.socket(family, socket.SOCK_STREAM)
+
+    @classmethod
+    def connect(cls, address):
+        """ connect to a game's stream """
+        sock = cls.getSocket(address)
+        sock.connect(cls.parseAddress(address))
+        return sock
+
+    @staticmethod
+    def encode(old, new):
+        """ encode the changes between two states: a byte flagging the fields
+            that changed, then the change of each as a zigzag varint """
+        out = bytearray(1)
+        for (i, (a, b)) in enumerate(zip(old, new)):
+            if a != b:
+                out[0] |= 1 << i
+                value = 2*(b - a) if b >= a else 2*(a - b) - 1
+                while value >= 0x80:
+                    out.append(value & 0x7f | 0x80)
+                    value >>= 7
+                out.append(value)
+        return bytes(out)
+
+    @staticmethod
+    def decode(data, i, state):
+        """ decode the changes at data[i] into a state, return the new state
+            and the index after the changes; raise IndexError if they are
+            incomplete """
+        flags = data[i]
+        i += 1
+        state = list(state)
+        for field in range(len(state)):
+            if flags >> field & 1:
+                value = shift = 0
+                while True:
+                    byte = data[i]
+                    i += 1
+                    value |= (byte & 0x7f) << shift
+                    if byte < 0x80:
+                        break
+                    shift += 7
+                state[field] += -(value >> 1) - 1 if value & 1 else value >> 1
+        return tuple(state), i
+
+    def broadcast(self, P1, P2, ball):
+        """ queue the state of a step for the streaming thread """
+        self.queue.put((P1.top, P2.top, ball.left, ball.top, P1.score, P2.score))
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def serve(self):
+        """ accept viewers and send them the changes of each step, off the
+            game loop """
+        closing = False
+        while not closing:
+            states = [self.state]
+            try:
+                states.append(self.queue.get(timeout=0.1))
+                while not self.queue.empty():  # catch up to the latest step
+                    states.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            closing = None in states
+            state = [state for state in states if state is not None][-1]
+
+            while True:  # new viewers start from the current state
+                try:
+                    sock, __ = self.server.accept()
+                except BlockingIOError:
+                    break
+                sock.setblocking(False)
+                self.viewers[sock] = bytearray(self.encode((0,) * self.FIELDS, self.state))
+
+            if state != self.state:
+                changes = self.encode(self.state, state)
+                self.state = state
+                for buffer in self.viewers.values():
+                    buffer += changes
+
+            for (sock, buffer) in list(self.viewers.items()):
+                try:
+                    n = sock.send(buffer) if buffer else 0
+                except BlockingIOError:
+                    n = 0
+                except OSError:  # the viewer left
+                    n = None
+                if n is None or len(buffer) - n > MAXBACKLOG:  # left or too slow
+                    del self.viewers[sock]
+                    sock.close()
+                else:
+                    del buffer[:n]
+                    self.sent += n
+
+        for (sock, buffer) in self.viewers.items():  # flush the last changes
+            try:
+                sock.settimeout(1)
+                sock.sendall(buffer)
+                self.sent += len(buffer)
+            except OSError:
+                pass
+            sock.close()
+        self.server.close()
+
+
+class Viewer(object):
+    """ spectator drawing a game streamed by Spectators """
+    def __init__(self, address):
+        """ connect to the game """
+        self.sock = Spectators.connect(address)
+        self.sock.setblocking(False)
+        self.Input = EventHandler()
+        self.Display = Display(self.Input)
+        self.P1 = Player(1)
+        self.P2 = Player(2)
+        self.Ball = Ball(0)
+        self.state = (0,) * Spectators.FIELDS
+        self.buffer = bytearray()
+
+    def receive(self):
+        """ apply the changes received, return False once the game has gone """
+        while True:
+            try:
+                data = self.sock.recv(1 << 16)
+            except BlockingIOError:
+                break
+            if not data:
+                return False
+            self.buffer += data
+
+        i = 0
+        try:
+            while i < len(self.buffer):
+                self.state, i = Spectators.decode(self.buffer, i, self.state)
+        except IndexError:  # the rest hasn't arrived yet
+            pass
+        del self.buffer[:i]
+
+        P1_top, P2_top, left, top, self.P1.score, self.P2.score = self.state
+        self.P1.top = self.P1.last_top = P1_top
+        self.P2.top = self.P2.last_top = P2_top
+        self.Ball.left, self.Ball.top = left, top
+        self.Ball.pos, self.Ball.last_pos = [left, top], [left, top]
+        return True
+
+    def run(self):
+        """ draw the game until it goes """
+        while self.receive():
+            for event in pygame.event.get():  # nothing else reads events
+                if event.type == QUIT or (event.type == KEYUP and event.key == K_ESCAPE):
+                    self.Input.terminate()
+            self.Display.currentGameState(self.P1, self.P2, self.Ball)
+            self.Display.FPSClock.tick(FPS)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='[Player 1] W / S, [Player 2] ↑ / ↓')
+    parser.add_argument('address',
+                        help="host:port or Unix socket path to stream the game at")
+    parser.add_argument('--watch', action='store_true',
+                        help="watch the game streamed at the address instead of playing")
+    parser.add_argument('--cpu', action='append', type=int, choices=[1, 2], default=[],
+                        help="let the computer play a player; may be repeated")
+    parser.add_argument('--difficulty', default='normal', choices=list(DIFFICULTIES),
+                        help="difficulty of the computer; default is normal")
+    args = parser.parse_args()
+
+    pygame.init()
+    pygame.display.set_caption('PONG')
+
+    if args.watch:
+        Viewer(args.address).run()
+        sys.exit()
+
+    spectators = Spectators(args.address)
+    try:
+        while True:  # main game loop
+            game = Game({player: args.difficulty for player in args.cpu}, spectators=spectators)
+            game.run()
+    finally:
+        spectators.close()  # send the viewers the last changes
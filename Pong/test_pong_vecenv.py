@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+""" tests of the PONG physics, scalar and batched, run with pytest """
+
+from main import *
+from vecenv import VecPong
+import main
+import numpy as np
+import random
+
+
+def getBall(games, i):
+    """ return a scalar ball in the state of a batched one """
+    ball = Ball(0)
+    ball.pos = [float(games.ball_x[i]), float(games.ball_y[i])]
+    ball.left, ball.top = round(ball.pos[0]), round(ball.pos[1])
+    ball.vx, ball.vy = games.ball_vx[i], games.ball_vy[i]
+    return ball
+
+
+def testVecPong(n=64, steps=2000, seed=0):
+    """ check a batch of games against the scalar classes given the same
+        inputs """
+    games = VecPong(n, seed)
+    players = [(Player(1), Player(2)) for _ in range(n)]
+    balls = [getBall(games, i) for i in range(n)]
+    rng = np.random.default_rng(seed)
+    inputs = rng.random((4, n)) < 0.5
+
+    for _ in range(steps):
+        flip = rng.random((4, n)) < 0.1  # hold keys for a few frames
+        inputs ^= flip
+        points = games.step(*inputs)
+
+        for (i, (P1, P2)) in enumerate(players):
+            P1.update(inputs[0, i], inputs[1, i])
+            P2.update(inputs[2, i], inputs[3, i])
+            balls[i].sweep(P1, P2)
+            P1_lost, P2_lost = P1.lose(balls[i]), P2.lose(balls[i])
+            assert points[i] == (2 if P1_lost else 1 if P2_lost else 0)
+            assert (P1.top, P1.vy, P1.score, P2.top, P2.vy, P2.score) == \
+                (games.P1_y[i], games.P1_vy[i], games.P1_score[i],
+                 games.P2_y[i], games.P2_vy[i], games.P2_score[i])
+            if points[i]:  # the batch has served a new ball
+                balls[i] = getBall(games, i)
+            else:
+                assert (*balls[i].pos, balls[i].vx, balls[i].vy) == \
+                    (games.ball_x[i], games.ball_y[i], games.ball_vx[i], games.ball_vy[i])
+
+        over = np.flatnonzero(games.over)
+        games.reset(over)
+        for i in over:
+            players[i] = (Player(1), Player(2))
+            balls[i] = getBall(games, i)
+
+
+def testSweep(monkeypatch, shots=10000, seed=0):
+    """ check that fast balls can't pass through a player with swept
+        collisions """
+    monkeypatch.setattr(main, 'MINBALLVELX', 30)  # faster than a player is wide
+    monkeypatch.setattr(main, 'MAXBALLVELX', 40)
+    rng = random.Random(seed)
+    for _ in range(shots):
+        P1, P2 = Player(1), Player(2)
+        P1.top = rng.randint(100, 450)
+        x, y = rng.uniform(200, 300), rng.uniform(150, 400)
+        vx, vy = -rng.uniform(30, 40), rng.uniform(-2, 2)
+        t = (P1.right - x) / vx  # when the ball reaches P1's face
+        expected = P1.top - BALLSIZE < y + vy*t < P1.bottom
+
+        ball = Ball(1)
+        ball.pos, ball.vx, ball.vy = [x, y], vx, vy
+        ball.left, ball.top = round(x), round(y)
+        while ball.vx < 0 and ball.right > 0:
+            ball.sweep(P1, P2)
+        assert (ball.vx > 0) == expected
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+""" a batch of headless PONG games stepped together with numpy """
+
+from init import *
+import numpy as np
+
+# positions, rounded like pygame.Rect attributes
+SERVEX = int(HALFWINWIDTH - BALLSIZE/2 + 0.5)  # ball's starting left
+PLAYERTOP = int(HALFWINHEIGHT - PLAYERHEIGHT/2 + 0.5)  # player's starting top
+P1LEFT = XMARGIN  # P1's left side
+P2LEFT = WINWIDTH - XMARGIN - PLAYERWIDTH  # P2's left side
+P1FACE = P1LEFT + PLAYERWIDTH  # ball's left touching P1
+P2FACE = P2LEFT - BALLSIZE  # ball's left touching P2
+
+
+def clamp(vx, vy):
+    """ keep the balls' velocities within their limits, like Ball.clamp """
+    np.copysign(np.clip(np.abs(vx), MINBALLVELX, MAXBALLVELX), vx, out=vx)
+    np.copysign(np.minimum(np.abs(vy), MAXBALLVELY), vy, out=vy)
+
+
+def bounce(hit, x, vx, vy, player_vy, direction, face):
+    """ bounce the balls hit off a player, like Ball.bounce """
+    vy[hit] += np.broadcast_to(player_vy, vy.shape)[hit]
+    with np.errstate(divide='ignore'):
+        speed = np.where(vy == 0, MAXBALLVELX, MINBALLVELX**2 / np.abs(vy))
+    vx[hit] = direction * speed[hit]
+    x[hit] = face  # prevent overlap
+    clamp(vx, vy)
+
+
+def sweep(x, y, vx, vy, P1_top, P1_vy, P2_top, P2_vy):
+    """ move balls through a step in place like Ball.sweep, given their exact
+        positions and the tops and velocities of the players they play
+        against, once the players have moved """
+    clamp(vx, vy)
+    left, top = np.round(x), np.round(y)  # rects before the step
+    for (player_left, player_top, player_vy, direction, face) in \
+            ((P1LEFT, P1_top, P1_vy, 1, P1FACE), (P2LEFT, P2_top, P2_vy, -1, P2FACE)):
+        hit = (left < player_left + PLAYERWIDTH) & (left + BALLSIZE > player_left) & \
+            (top < player_top + PLAYERHEIGHT) & (top + BALLSIZE > player_top)
+        bounce(hit, x, vx, vy, player_vy, direction, face)  # a player has moved onto the ball
+
+    time_left = np.ones_like(x)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for __ in range(8):  # bounces per step
+            # time of each collision within the step, or infinity
+            wall_t = np.where(vy < 0, -y / vy, np.where(vy > 0, (WINHEIGHT - BALLSIZE - y) / vy, np.inf))
+            wall_t[~((0 <= wall_t) & (wall_t <= time_left))] = np.inf
+            towards_P1 = (vx < 0) & (x >= P1FACE)
+            towards_P2 = (vx > 0) & (x + BALLSIZE <= P2LEFT)
+            face_t = np.where(towards_P1, (P1FACE - x) / vx,
+                              np.where(towards_P2, (P2FACE - x) / vx, np.inf))
+            player_top = np.where(vx < 0, P1_top, P2_top)
+            face_y = y + vy*face_t
+            face_t[~((0 <= face_t) & (face_t <= time_left) &
+                     (player_top - BALLSIZE < face_y) & (face_y < player_top + PLAYERHEIGHT))] = np.inf
+
+            t = np.minimum(wall_t, face_t)
+            hit = np.isfinite(t)
+            if not hit.any():
+                break
+            x[hit] += (vx*t)[hit]
+            y[hit] += (vy*t)[hit]
+            time_left[hit] -= t[hit]
+            wall = hit & (wall_t <= face_t)  # the wall comes first on a tie
+            P1_hit, P2_hit = hit & ~wall & (vx < 0), hit & ~wall & (vx > 0)
+            vy[wall] *= -1  # change vertical velocity
+            bounce(P1_hit, x, vx, vy, P1_vy, 1, P1FACE)
+            bounce(P2_hit, x, vx, vy, P2_vy, -1, P2FACE)
+
+    x += vx*time_left  # move the balls
+    y += vy*time_left
+
+
+class VecPong(object):
+    """ n games of pong, with the same rules as Ball and Player but without
+        the pause at the start of each round """
+    def __init__(self, n, seed=None):
+        """ initialise the state of every game """
+        self.n = n
+        self.rng = np.random.default_rng(seed)
+
+        self.ball_x = np.empty(n)  # ball's exact left
+        self.ball_y = np.empty(n)  # ball's exact top
+        self.ball_vx = np.empty(n)
+        self.ball_vy = np.empty(n)
+        self.P1_y = np.empty(n, dtype=np.int64)  # players' tops
+        self.P2_y = np.empty(n, dtype=np.int64)
+        self.P1_vy = np.empty(n, dtype=np.int64)
+        self.P2_vy = np.empty(n, dtype=np.int64)
+        self.P1_score = np.empty(n, dtype=np.int64)
+        self.P2_score = np.empty(n, dtype=np.int64)
+        self.over = np.empty(n, dtype=bool)  # max score or shame limit reached
+
+        self.reset(np.arange(n))
+
+    def reset(self, index):
+        """ start new games """
+        self.P1_y[index] = self.P2_y[index] = PLAYERTOP
+        self.P1_vy[index] = self.P2_vy[index] = 0
+        self.P1_score[index] = self.P2_score[index] = 0
+        self.over[index] = False
+        self.serve(index)
+
+    def serve(self, index):
+        """ start new rounds like Ball.__init__, towards P2 on even rounds """
+        n = len(index)
+        self.ball_x[index] = SERVEX
+        self.ball_y[index] = self.rng.integers(0, WINHEIGHT - BALLSIZE, n,
+                                               endpoint=True)
+        vy = self.rng.choice([-1, 1], n) * \
+            self.rng.integers(MINBALLVELY, MAXBALLVELY, n, endpoint=True)
+        towards = np.where((self.P1_score[index] + self.P2_score[index]) % 2,
+                           -1, 1)
+        self.ball_vx[index] = towards * MINBALLVELX**2 / np.abs(vy)
+        self.ball_vy[index] = vy
+
+    def movePlayers(self, y, vy, move_up, move_down):
+        """ move the players of one side given inputs, like Player.update """
+        vy += np.where(move_up, -PLAYERACCELY, PLAYERACCELY)
+        np.clip(vy, -MAXPLAYERVELY, MAXPLAYERVELY, out=vy)
+        vy[move_up == move_down] = 0  # gridlock or no movement
+        y += vy
+        np.clip(y, 0, WINHEIGHT - PLAYERHEIGHT, out=y)  # keep them in the window
+
+    def step(self, P1_move_up, P1_move_down, P2_move_up, P2_move_down):
+        """ step every game by a frame given the inputs of each player, and
+            return who scored in each: 1 for P1, 2 for P2 or 0; games that
+            are over score no more points until they are reset """
+        self.movePlayers(self.P1_y, self.P1_vy, P1_move_up, P1_move_down)
+        self.movePlayers(self.P2_y, self.P2_vy, P2_move_up, P2_move_down)
+
+        sweep(self.ball_x, self.ball_y, self.ball_vx, self.ball_vy,
+              self.P1_y, self.P1_vy, self.P2_y, self.P2_vy)
+        left = np.round(self.ball_x)  # rounded like Ball.sweep
+
+        # score the points, like Player.lose
+        points = np.where(left >= WINWIDTH, 1, np.where(left + BALLSIZE <= 0, 2, 0))
+        points[self.over] = 0
+        self.P1_score += points == 1
+        self.P2_score += points == 2
+        self.over |= (np.abs(self.P1_score - self.P2_score) >= SHAMELIMIT) | \
+            (np.maximum(self.P1_score, self.P2_score) >= MAXPOINTS)
+
+        serve = np.flatnonzero((points != 0) & ~self.over)
+        if len(serve):
+            self.serve(serve)
+        return points
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+""" a placement-search bot for the TETRIS clone """
+
+from core import *
+from operator import sub
+
+# heuristic weights of the features of a board after a placement
+WEIGHTS = {'height': -0.510066,  # sum of the column heights
+           'lines': 0.760666,  # lines cleared by the placement
+           'holes': -0.35663,  # empty cells below a filled cell
+           'bumpiness': -0.184483}  # sum of the height differences
+
+
+def get_rows(board):
+    """ returns the padded bitboard rows of a board, followed by WALL empty
+        rows so that the rows above the board can be indexed from the end """
+    walls = (1 << WALL) - 1
+    empty_row = walls | walls << (board.w + WALL)
+    if isinstance(board, BitBoard):
+        return board.rows + [empty_row] * WALL
+
+    rows = [empty_row | sum(1 << (x + WALL) for x in range(board.w) if row[x])
+            for row in board.grid]
+    return rows + [(1 << (board.w + 2 * WALL)) - 1] * WALL + [empty_row] * WALL
+
+
+def is_valid(rows, shape, rotation, x, y):
+    """ checks if a piece fits the padded bitboard rows """
+    for (dy, mask) in MASKS[shape, rotation]:
+        if rows[y + dy] & mask << (x + WALL):
+            return False
+    return True
+
+
+def get_tops(rows, w):
+    """ returns the topmost filled row of each column """
+    tops = []
+    for x in range(w):
+        bit, top = 1 << (x + WALL), 0
+        while not rows[top] & bit:  # the rows below the floor are full
+            top += 1
+        tops.append(top)
+    return tops
+
+
+def get_placements(rows, tops, shape, x, y):
+    """ yields the (rotation, x, y) of every final position reachable from
+        (x, y) by rotating right, then moving sideways, then dropping """
+    for rotation in range(len(SHAPES[shape])):
+        if not is_valid(rows, shape, rotation, x, y):
+            break  # the following rotations pass through this one
+
+        profile = PROFILES[shape, rotation]
+        for step in (-1, 1):
+            dx = 0 if step == 1 else -1
+            while is_valid(rows, shape, rotation, x + dx, y):
+                # the lowest block of each column falls to the top of the stack
+                drop = min(tops[x + dx + px] - py - 1 for (px, py) in profile)
+                if drop < y:  # the piece is under an overhang
+                    drop = y
+                    while is_valid(rows, shape, rotation, x + dx, drop + 1):
+                        drop += 1
+                yield rotation, x + dx, drop
+                dx += step
+
+
+def evaluate(rows, w, h, top, shape, rotation, x, y, weights):
+    """ scores the board, whose rows above top are empty, after setting
+        a piece """
+    rows = rows[:h]
+    for (dy, mask) in MASKS[shape, rotation]:
+        if y + dy < 0:
+            return None  # the piece would top out
+        rows[y + dy] |= mask << (x + WALL)
+
+    inner = ((1 << w) - 1) << WALL  # the bits of the columns
+    full_row = (1 << (w + 2 * WALL)) - 1
+    lines = 0
+    for (dy, _) in MASKS[shape, rotation]:
+        if rows[y + dy] == full_row:
+            lines += 1
+    if lines:
+        rows = [row for row in rows if row != full_row]
+        rows[:0] = [full_row ^ inner] * lines
+
+    heights, holes, covered = [0] * (w + WALL), 0, 0
+    top = min(top, y + BOUNDS[shape, rotation][1])
+    for (i, row) in enumerate(rows[top:], top):
+        row &= inner
+        new = row & ~covered
+        while new:  # columns reached for the first time
+            bit = new & -new
+            heights[bit.bit_length() - 1] = h - i
+            new ^= bit
+        covered |= row
+        holes += (covered & ~row).bit_count()
+        if covered == inner:  # every column has been reached
+            holes += sum((inner & ~row).bit_count() for row in rows[i + 1:])
+            break
+
+    heights = heights[WALL:]
+    bumpiness = sum(map(abs, map(sub, heights, heights[1:])))
+    return (weights['height'] * sum(heights) + weights['lines'] * lines +
+            weights['holes'] * holes + weights['bumpiness'] * bumpiness)
+
+
+def search(board, weights=WEIGHTS, use_hold=True):
+    """ returns the best (hold, rotation, x) placement and the number of
+        placements evaluated """
+    rows = get_rows(board)
+    tops = get_tops(rows, board.w)
+    top = min(tops)
+    candidates = [(False, board.pieces[0].shape,
+                   board.pieces[0].x, board.pieces[0].y)]
+    if use_hold and board.hold:
+        held = board.pieces[2] or board.pieces[1]
+        candidates.append((True, held.shape, 3, -3))
+
+    best, best_score, n = None, None, 0
+    for (hold, shape, x, y) in candidates:
+        for (rotation, x, y) in get_placements(rows, tops, shape, x, y):
+            score = evaluate(rows, board.w, board.h, top, shape,
+                             rotation, x, y, weights)
+            n += 1
+            if score is not None and (best is None or score > best_score):
+                best, best_score = (hold, rotation, x), score
+    return best, n
+
+
+class Bot(Inputs):
+    """ inputs of a bot playing the best placement of each piece """
+    __slots__ = ('weights', 'use_hold', 'n_pieces', 'placement')
+
+    def __init__(self, weights=WEIGHTS, use_hold=True):
+        super().__init__()
+        self.weights = weights
+        self.use_hold = use_hold
+        self.n_pieces = None  # number of pieces set when last searched
+        self.placement = None  # (hold, rotation, x) of the current piece
+
+    def update(self, board):
+        """ holds the keys for the next input towards the placement """
+        self.reset()
+        if board.n_pieces != self.n_pieces:  # a new piece has entered
+            self.n_pieces = board.n_pieces
+            self.placement, _ = search(board, self.weights, self.use_hold)
+        if self.placement is None:
+            return
+
+        hold, rotation, x = self.placement
+        piece = board.pieces[0]
+        if hold and board.hold:
+            self.hold = True
+        elif piece.rotation != rotation:
+            self.rotate_right = True
+        elif piece.x < x:
+            self.move_right = True
+        elif piece.x > x:
+            self.move_left = True
+        elif piece.y != board.pieces[3].y:  # wait on the ghost to be set
+            self.drop = True
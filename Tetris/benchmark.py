@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+""" benchmarks for the TETRIS clone """
+
+from argparse import ArgumentParser
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')  # render off screen
+from ai import search
+from main import *
+import random
+import time
+
+
+def fill(board, rng, height=12, density=0.7):
+    """ fills the bottom rows of a board with random garbage """
+    for y in range(board.h - height, board.h):
+        for x in range(board.w):
+            if rng.random() < density:
+                board.grid[y][x] = WHITE
+        if isinstance(board, BitBoard):
+            board.rows[y] = board.empty_row
+            for x in range(board.w):
+                if board.grid[y][x]:
+                    board.rows[y] |= 1 << (x + WALL)
+    board.get_heights()
+
+
+def bench_collision(n, seed):
+    """ collision checks per second for each board engine """
+    for board_class in (Board, BitBoard):
+        rng = random.Random(seed)
+        board = board_class(8, 8, 10, 20, seed)
+        fill(board, rng)
+
+        pieces = []
+        for _ in range(1000):
+            piece = Piece(rng.choice(NAMES))
+            piece.rotation = rng.randrange(len(SHAPES[piece.shape]))
+            piece.x, piece.y = rng.randint(-2, board.w - 1), rng.randint(-3, board.h - 1)
+            pieces.append(piece)
+
+        is_valid_position = board.is_valid_position
+        start = time.perf_counter()
+        for _ in range(n // len(pieces)):
+            for piece in pieces:
+                is_valid_position(piece)
+        elapsed = time.perf_counter() - start
+
+        print("[collision] {:<8} {:>10,.0f} checks/s".format(
+              board_class.__name__, n / elapsed))
+
+
+def play(board, n, seed):
+    """ plays a board for n ticks with random held keys """
+    rng = random.Random(seed)
+    frames = [tuple(rng.random() < 0.05 for _ in Inputs.__slots__)
+              for _ in range(997)]
+    inputs = Inputs()
+    start = time.perf_counter()
+    for tick in range(n):
+        (inputs.move_left, inputs.move_right, inputs.move_down,
+         inputs.rotate_left, inputs.rotate_right, inputs.drop,
+         inputs.hold) = frames[tick % len(frames)]
+        board.update(inputs)
+        if board.is_topped_out():
+            board.__init__(board.x, board.y, board.w, board.h, board.seed)
+    return time.perf_counter() - start
+
+
+def bench_ticks(n, seed):
+    """ headless ticks per second for each board engine """
+    for board_class in (Board, BitBoard):
+        boards = [board_class(8, 8, 10, 20, seed) for _ in range(2)]
+        elapsed = play(boards[0], n, seed)
+        play(boards[1], n, seed)
+        # the same seed and inputs must give identical boards
+        assert boards[0].grid == boards[1].grid and \
+            boards[0].score == boards[1].score
+
+        print("[ticks]     {:<8} {:>10,.0f} ticks/s".format(
+              board_class.__name__, n / elapsed))
+
+
+def bench_ai(n, seed):
+    """ placements evaluated per second by the bot """
+    rng = random.Random(seed)
+    boards = []
+    for i in range(100):
+        board = BitBoard(8, 8, 10, 20, seed + i)
+        fill(board, rng, rng.randint(0, 12), 0.6)
+        boards.append(board)
+
+    placements, start = 0, time.perf_counter()
+    for i in range(n):
+        placements += search(boards[i % len(boards)])[1]
+    elapsed = time.perf_counter() - start
+
+    print("[ai]        {:>10,.0f} placements/s {:>8.1f} us/search".format(
+          placements / elapsed, elapsed / n * 1e6))
+
+
+def bench_vecenv(n, seed, size=4096):
+    """ placements per second of a batch of boards """
+    from vecenv import VecBoards, np
+
+    rng = random.Random(seed)
+    vec = VecBoards(size, seeds=range(size))
+    actions = np.random.default_rng(seed).integers(0, 10, (n, 2, size))
+    start = time.perf_counter()
+    for (rotations, xs) in actions:
+        vec.step(rotations, xs)
+        if vec.over.any():
+            vec.reset(vec.over, rng.getrandbits(32) + np.arange(vec.over.sum()))
+    elapsed = time.perf_counter() - start
+
+    print("[vecenv]    {:>10,.0f} placements/s ({} boards)".format(
+          n * size / elapsed, size))
+
+
+def get_state(board):
+    """ returns a copy of the state of a board as comparable values """
+    state = [getattr(board, key) for key in Board.__slots__
+             if key not in ('grid', 'heights', 'pieces')]
+    state += [piece and (piece.shape, piece.rotation, piece.x, piece.y,
+                         piece.color) for piece in board.pieces]
+    return state + [[row[:] for row in board.grid], board.heights[:],
+                    getattr(board, 'rows', [])[:]]
+
+
+def bench_rewind(n, seed):
+    """ snapshot and restore times of the rewind buffer, after checking that
+        rewinding restores every state """
+    for board_class in (Board, BitBoard):
+        rng = random.Random(seed)
+        board = board_class(8, 8, 10, 20, seed)
+        rewind = Rewind(board.w, board.h, n / TICK_RATE)  # holds every tick
+        inputs, states = Inputs(), []
+        pushed = popped = 0
+        for _ in range(n):
+            if board.is_topped_out():
+                board.__init__(board.x, board.y, board.w, board.h, board.seed)
+                rewind.clear()
+                states = []
+            inputs.set_bits(rng.getrandbits(7) & rng.getrandbits(7))
+            states.append(get_state(board))
+            start = time.perf_counter()
+            rewind.push(board)
+            pushed += time.perf_counter() - start
+            board.update(inputs)
+
+        for state in reversed(states):
+            start = time.perf_counter()
+            rewind.pop(board)
+            popped += time.perf_counter() - start
+            assert get_state(board) == state
+        assert not rewind.pop(board)
+
+        print("[rewind]    {:<8} {:>6.2f} us/push {:>6.2f} us/pop "
+              "({:,} bytes/s)".format(board_class.__name__,
+                                      pushed / n * 1e6,
+                                      popped / len(states) * 1e6,
+                                      rewind.size * TICK_RATE))
+
+
+class RandomInputs(EventHandler):
+    """ event handler pressing random keys """
+    __slots__ = ('rng',)
+
+    def __init__(self, seed):
+        super().__init__()
+        self.rng = random.Random(seed)
+
+    def get_events(self):
+        for key in Inputs.__slots__:
+            setattr(self, key, self.rng.random() < 0.2)
+
+
+def bench_render(n, seed, scale=SCALE):
+    """ frame time of the renderer during a random game; it still grows with
+        the scale, as the area changed each frame, mostly the falling piece,
+        is scaled up to the window """
+    random.seed(seed)
+    engine = Engine(scale=scale)
+    engine.event_handler = RandomInputs(seed)
+    engine.init()
+
+    elapsed = 0
+    for _ in range(n):
+        engine.event_handler.get_events()
+        engine.board.update(engine.event_handler)
+        if engine.board.is_topped_out():
+            engine.init()
+        engine.gui.update(engine.board.level, engine.board.score)
+
+        start = time.perf_counter()
+        engine.render()
+        elapsed += time.perf_counter() - start
+
+    print("[render]    x{:<7} {:>10.1f} us/frame".format(scale, elapsed / n * 1e6))
+
+
+def bench_stack(n, seed):
+    """ time to redraw a high stack of blocks """
+    engine = Engine()
+    engine.init(seed)
+    fill(engine.board, random.Random(seed), 18, 0.8)
+
+    start = time.perf_counter()
+    for _ in range(n):
+        engine.renderer.render_stack(engine.board)
+    elapsed = time.perf_counter() - start
+
+    print("[stack]     {:>19.1f} us/stack".format(elapsed / n * 1e6))
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('-n', default=200000, type=int,
+                        help="number of iterations; default is 200000")
+    parser.add_argument('--seed', default=0, type=int,
+                        help="seed for the random workload; default is 0")
+    args = parser.parse_args()
+
+    bench_collision(args.n, args.seed)
+    bench_ticks(args.n, args.seed)
+    bench_ai(args.n // 1000, args.seed)
+    bench_vecenv(args.n // 2000, args.seed)
+    bench_rewind(args.n // 10, args.seed)
+    for scale in (1, 2, 4, 6, 8):  # scaling the changed rects only
+        bench_render(args.n // 100, args.seed, scale)
+    bench_stack(args.n // 100, args.seed)
@@ -0,0 +1,10 @@
+""" pytest setup for running the tests from the repository root, where the
+    games share module names """
+
+import sys
+
+
+def pytest_collectstart(collector):
+    """ forget the modules another game's tests imported under the same names """
+    for name in ('main', 'vecenv'):
+        sys.modules.pop(name, None)
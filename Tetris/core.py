@@ -0,0 +1,422 @@
+#!/usr/bin/env python
+""" the headless core of the TETRIS clone, stepped a tick at a time """
+
+import random
+
+TICK_RATE = 60  # ticks per second
+FALL_DELAY = 30  # ticks between falls at level 0 (0.5s)
+MOVE_DELAY = 4  # ticks between repeated moves (75ms)
+LOCK_DELAY = 4  # ticks a piece rests on its ghost before being set (80ms)
+WALL = 4  # padding of the bitboard rows in blocks
+
+GRAY = (64, 64, 64)
+WHITE = (255, 255, 255)
+
+MULTIPLIER = {1: 40, 2: 100, 3: 300, 4: 1200}
+
+SHAPES = {'I': [['....', '####', '....', '....'],
+                ['..#.', '..#.', '..#.', '..#.']],
+          'J': [['...', '###', '..#'],
+                ['.#.', '.#.', '##.'],
+                ['#..', '###', '...'],
+                ['.##', '.#.', '.#.']],
+          'L': [['...', '###', '#..'],
+                ['##.', '.#.', '.#.'],
+                ['..#', '###', '...'],
+                ['.#.', '.#.', '.##']],
+          'O': [['....', '.##.', '.##.', '....']],
+          'S': [['...', '.##', '##.'],
+                ['.#.', '.##', '..#']],
+          'T': [['...', '###', '.#.'],
+                ['.#.', '##.', '.#.'],
+                ['.#.', '###', '...'],
+                ['.#.', '.##', '.#.']],
+          'Z': [['...', '##.', '.##'],
+                ['..#', '.##', '.#.']]}
+
+
+def compile_shapes(shapes):
+    """ compiles the shape templates into tables keyed by (shape, rotation) """
+    cells, bounds, profiles, masks = {}, {}, {}, {}
+    for shape, rotations in shapes.items():
+        for rotation, template in enumerate(rotations):
+            key = (shape, rotation)
+            # (x, y) offsets of the blocks from the top left position
+            cells[key] = tuple((x, y) for y in range(len(template))
+                               for x in range(len(template))
+                               if template[y][x] == '#')
+            xs = sorted({x for (x, _) in cells[key]})
+            ys = sorted({y for (_, y) in cells[key]})
+            # (min x, min y, max x, max y) of the blocks
+            bounds[key] = (xs[0], ys[0], xs[-1], ys[-1])
+            # (x, max y) of the lowest block in each column
+            profiles[key] = tuple((x, max(y for (cx, y) in cells[key] if cx == x))
+                                  for x in xs)
+            # (y, bitmask) of the blocks in each row
+            masks[key] = tuple((y, sum(1 << x for (x, cy) in cells[key] if cy == y))
+                               for y in ys)
+    return cells, bounds, profiles, masks
+
+
+CELLS, BOUNDS, PROFILES, MASKS = compile_shapes(SHAPES)
+NAMES = sorted(SHAPES)  # shapes in the order drawn by the piece generator
+
+
+class Piece(object):
+    """ tetromino class """
+    __slots__ = ('x', 'y', 'shape', 'rotation', 'color')
+    
+    def __init__(self, shape, color=WHITE):
+        self.x, self.y = 14, 10  # top left position in blocks
+        self.shape = shape
+        self.rotation = 0  # current rotation
+        self.color = color  # color
+
+    def get_template(self):
+        """ returns the positions of the blocks on the board """
+        return [(self.x + x, self.y + y)
+                for (x, y) in CELLS[self.shape, self.rotation]]
+
+    def move(self, x, y):
+        self.x += x
+        self.y += y
+
+    def rotate(self, rotation):
+        self.rotation = (self.rotation + rotation) % len(SHAPES[self.shape])
+
+    def hold(self):
+        """ puts the piece in the holding area """
+        self.x, self.y = 14, 16
+        self.rotation = 0
+
+    def reset(self):
+        """ sets the piece to enter by the top """
+        self.x, self.y = 3, -3
+        self.rotation = 0
+
+
+class Board(object):
+    """ board class """
+    __slots__ = ('x', 'y', 'w', 'h', 'grid', 'heights', 'pieces', 'n_pieces',
+                 'hold', 'level', 'score', 'lines', 'fall_speed', 'seed',
+                 'tick', 'last_fall_tick', 'last_move_tick',
+                 'last_update_tick')
+    
+    def __init__(self, x, y, w, h, seed=None):
+        self.x, self.y = x, y  # top left position in pixels
+        self.w, self.h = w, h  # height and width in blocks
+        # state of the piece generator
+        self.seed = random.getrandbits(64) if seed is None else seed
+
+        # make an empty board
+        self.grid = [[None for _ in range(w)] for _ in range(h)]
+        # topmost filled row of each column
+        self.heights = [h] * w
+        # [current piece, next piece, held piece, ghost piece]
+        self.pieces = [None, self.new_piece(), None, None]
+        self.get_next_piece()
+        self.pieces[3] = Piece(self.pieces[0].shape, GRAY)
+        self.get_ghost()
+        self.n_pieces = 0  # number of pieces set
+        self.hold = True  # allow holding
+
+        self.level, self.score = 0, 0
+        self.lines = 0  # lines cleared
+        self.fall_speed = FALL_DELAY
+        self.tick = 0
+        self.last_fall_tick = 0
+        self.last_move_tick = 0
+        self.last_update_tick = 0
+
+    def new_piece(self):
+        """ returns a piece of a pseudorandom shape """
+        self.seed = (self.seed * 6364136223846793005 +
+                     1442695040888963407) & 0xFFFFFFFFFFFFFFFF  # 64-bit LCG
+        return Piece(NAMES[(self.seed >> 32) % len(NAMES)])
+
+    def drop_piece(self):
+        """ drops the piece to it's ghost's position """
+        self.last_update_tick = self.tick
+        self.pieces[0].x, self.pieces[0].y = self.pieces[3].x, self.pieces[3].y
+        
+    def hold_piece(self):
+        """ assigns the piece to holding area """
+        if self.pieces[2]:
+            self.pieces[0], self.pieces[2] = self.pieces[2], self.pieces[0]
+        else:
+            self.pieces[:3] = [self.pieces[1], self.new_piece(), self.pieces[0]]
+
+        self.pieces[0].reset()
+        self.pieces[2].hold()
+        self.hold = False
+        self.get_ghost()
+
+    def get_ghost(self):
+        """ shows where the piece will fall """
+        piece, ghost = self.pieces[0], self.pieces[3]
+        ghost.shape, ghost.rotation = piece.shape, piece.rotation
+        ghost.x, ghost.y = piece.x, piece.y + self.drop_distance(piece)
+
+    def get_next_piece(self):
+        self.pieces[0], self.pieces[1] = self.pieces[1], self.new_piece()
+        self.pieces[0].reset()  # starting position of the current piece
+
+    def set_piece(self):
+        """ sets the piece inplace on the board """
+        for (x, y) in self.pieces[0].get_template():
+            if y >= 0:  # blocks above the board are lost
+                self.grid[y][x] = self.pieces[0].color
+                self.heights[x] = min(self.heights[x], y)
+
+        self.score += 10
+        self.n_pieces += 1
+        self.get_next_piece()
+
+    def is_valid_position(self, piece):
+        """ checks if the piece is in a valid position on the board """
+        key = (piece.shape, piece.rotation)
+        min_x, _, max_x, max_y = BOUNDS[key]
+        if piece.x + min_x < 0 or piece.x + max_x >= self.w or \
+                piece.y + max_y >= self.h:
+            return False
+        for (x, y) in CELLS[key]:
+            if piece.y + y >= 0 and self.grid[piece.y + y][piece.x + x]:
+                return False
+        return True
+
+    def get_floor(self, x, y):
+        """ returns the first filled row below a cell """
+        floor = max(y + 1, 0)
+        while floor < self.h and not self.grid[floor][x]:
+            floor += 1
+        return floor
+
+    def drop_distance(self, piece):
+        """ returns how many rows a validly placed piece can fall """
+        distance = self.h - piece.y  # an upper bound
+        for (x, y) in PROFILES[piece.shape, piece.rotation]:
+            x, y = piece.x + x, piece.y + y
+            floor = self.heights[x]
+            if floor <= y:  # the block has slid under an overhang
+                floor = self.get_floor(x, y)
+            distance = min(distance, floor - y - 1)
+        return distance
+
+    def get_heights(self):
+        """ rebuilds the height map of the board """
+        self.heights = [self.get_floor(x, -1) for x in range(self.w)]
+
+    def set_grid(self, grid):
+        """ replaces the blocks of the board """
+        self.grid = grid
+        self.get_heights()
+
+    def clear_lines(self):
+        """ removes full rows and returns the number of lines cleared """
+        lines_cleared = 0
+        for row in reversed(range(self.h)):
+            while None not in self.grid[row]:
+                self.grid[1:row + 1] = self.grid[:row]
+                self.grid[0] = [None] * self.w
+                lines_cleared += 1
+
+        if lines_cleared:
+            self.get_heights()
+        return lines_cleared
+
+    def is_topped_out(self):
+        """ checks if pieces have hit the top of the board """
+        return any(self.grid[0])
+
+    def move_piece(self, x, y):
+        self.pieces[0].move(x, y)
+        if self.is_valid_position(self.pieces[0]):
+            self.last_move_tick = self.last_update_tick = self.tick
+            if x:  # falling does not move the ghost
+                self.get_ghost()
+            return True
+        self.pieces[0].move(-x, -y)
+        return False
+                
+    def rotate_piece(self, rotation):
+        self.pieces[0].rotate(rotation)
+        if self.is_valid_position(self.pieces[0]):
+            self.get_ghost()
+            return True
+        self.pieces[0].rotate(-rotation)
+        return False
+
+    def lock_piece(self):
+        """ sets the piece, clears lines and updates the score and level """
+        self.set_piece()
+        self.hold = True
+
+        lines_cleared = self.clear_lines()
+        self.lines += lines_cleared
+        if lines_cleared:
+            # update the score
+            self.score += MULTIPLIER[lines_cleared] * (self.level + 1)
+        self.get_ghost()
+
+        if self.level < 30:
+            self.level = self.score // 1000  # update the level
+            # update the falling speed of the pieces
+            self.fall_speed = FALL_DELAY - self.level * 9 // 10
+
+    def place(self, rotation, x):
+        """ rotates the piece right, moves it sideways towards x until
+            blocked, then drops and sets it """
+        for _ in range(rotation):
+            if not self.rotate_piece(1):
+                break
+        while self.pieces[0].x != x and \
+                self.move_piece(1 if x > self.pieces[0].x else -1, 0):
+            pass
+        self.drop_piece()
+        self.lock_piece()
+
+    def update(self, inputs):
+        """ updates the board by a tick """
+        self.tick += 1
+        moved = self.tick - self.last_move_tick > MOVE_DELAY
+
+        if inputs.move_left and moved:
+            self.move_piece(-1, 0)
+        elif inputs.move_right and moved:
+            self.move_piece(1, 0)
+        elif inputs.move_down and moved:
+            self.move_piece(0, 1)
+        elif inputs.drop:
+            self.drop_piece()
+            inputs.drop = False
+
+        if inputs.rotate_left:
+            self.rotate_piece(-1)
+            inputs.rotate_left = False
+        elif inputs.rotate_right:
+            self.rotate_piece(1)
+            inputs.rotate_right = False
+            
+        if inputs.hold and self.hold:
+            self.hold_piece()
+            inputs.hold = False
+
+        if self.tick - self.last_fall_tick > self.fall_speed:
+            self.last_fall_tick = self.tick
+            self.move_piece(0, 1)
+
+        if self.tick - self.last_update_tick > LOCK_DELAY:
+            self.last_update_tick = self.tick
+            if (self.pieces[0].x, self.pieces[0].y) == \
+                    (self.pieces[3].x, self.pieces[3].y):
+                self.lock_piece()
+                inputs.reset()
+
+
+class BitBoard(Board):
+    """ board class storing each row as a bitmask, with colours kept in grid;
+        rows are padded by WALL filled columns and rows on each side so that
+        collisions need no bounds checks """
+    __slots__ = ('rows', 'empty_row', 'full_row')
+
+    def __init__(self, x, y, w, h, seed=None):
+        walls = (1 << WALL) - 1
+        self.empty_row = walls | walls << (w + WALL)
+        self.full_row = (1 << (w + 2 * WALL)) - 1
+        self.rows = [self.empty_row] * h + [self.full_row] * WALL
+        super().__init__(x, y, w, h, seed)
+
+    def set_grid(self, grid):
+        """ replaces the blocks of the board """
+        self.rows = [self.empty_row | sum(1 << (x + WALL)
+                                          for (x, color) in enumerate(row)
+                                          if color)
+                     for row in grid] + [self.full_row] * WALL
+        super().set_grid(grid)
+
+    def set_piece(self):
+        """ sets the piece inplace on the board """
+        piece = self.pieces[0]
+        for (dy, mask) in MASKS[piece.shape, piece.rotation]:
+            if piece.y + dy >= 0:
+                self.rows[piece.y + dy] |= mask << (piece.x + WALL)
+        for (x, y) in piece.get_template():
+            if y >= 0:
+                self.grid[y][x] = piece.color
+                self.heights[x] = min(self.heights[x], y)
+
+        self.score += 10
+        self.n_pieces += 1
+        self.get_next_piece()
+
+    def is_valid_position(self, piece):
+        """ checks if the piece is in a valid position on the board """
+        rows, empty_row = self.rows, self.empty_row
+        x, y = piece.x + WALL, piece.y
+        for (dy, mask) in MASKS[piece.shape, piece.rotation]:
+            if (rows[y + dy] if y + dy >= 0 else empty_row) & mask << x:
+                return False
+        return True
+
+    def get_floor(self, x, y):
+        """ returns the first filled row below a cell """
+        floor, bit = max(y + 1, 0), 1 << (x + WALL)
+        while not self.rows[floor] & bit:  # the rows below the floor are full
+            floor += 1
+        return floor
+
+    def clear_lines(self):
+        """ removes full rows and returns the number of lines cleared """
+        full = [y for y in range(self.h) if self.rows[y] == self.full_row]
+        for y in full:  # top to bottom, so lower indices stay valid
+            del self.rows[y], self.grid[y]
+            self.rows.insert(0, self.empty_row)
+            self.grid.insert(0, [None] * self.w)
+
+        if full:
+            self.get_heights()
+        return len(full)
+
+    def is_topped_out(self):
+        """ checks if pieces have hit the top of the board """
+        return self.rows[0] != self.empty_row
+
+
+class Inputs(object):
+    """ inputs held during a tick """
+    __slots__ = ('move_left', 'move_right', 'move_down',
+                 'rotate_left', 'rotate_right', 'drop', 'hold')
+    
+    def __init__(self):
+        self.move_left = False
+        self.move_right = False
+        self.move_down = False
+        self.rotate_left = False
+        self.rotate_right = False
+        self.drop = False
+        self.hold = False
+
+    def reset(self):
+        self.move_left = False
+        self.move_right = False
+        self.move_down = False
+        self.rotate_left = False
+        self.rotate_right = False
+        self.drop = False
+        self.hold = False
+
+    def get_bits(self):
+        """ returns the inputs packed into a bitfield """
+        return (self.move_left | self.move_right << 1 | self.move_down << 2 |
+                self.rotate_left << 3 | self.rotate_right << 4 |
+                self.drop << 5 | self.hold << 6)
+
+    def set_bits(self, bits):
+        """ sets the inputs from a bitfield """
+        self.move_left = bool(bits & 1)
+        self.move_right = bool(bits & 2)
+        self.move_down = bool(bits & 4)
+        self.rotate_left = bool(bits & 8)
+        self.rotate_right = bool(bits & 16)
+        self.drop = bool(bits & 32)
+        self.hold = bool(bits & 64)
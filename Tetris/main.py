@@ -1,245 +1,23 @@
 #!/usr/bin/env python
 """ a TETRIS clone by Joshua Wong """
 
+from ai import Bot
 from argparse import ArgumentParser
+from core import *
 from pygame.locals import *
-import copy
+from replay import Log, simulate
+from rewind import Rewind
 import pygame
 import random
 import sys
 import time
 
 FONT = 'PressStart2P.ttf'
-SCALE = 2
+SCALE = 2  # default integer scale of the window
 WIN_WIDTH = 176
 WIN_HEIGHT = 176
 
 BLACK = (0, 0, 0)
-GRAY = (64, 64, 64)
-WHITE = (255, 255, 255)
-
-MULTIPLIER = {1: 40, 2: 100, 3: 300, 4: 1200}
-
-SHAPES = {'I': [['....', '####', '....', '....'],
-                ['..#.', '..#.', '..#.', '..#.']],
-          'J': [['...', '###', '..#'],
-                ['.#.', '.#.', '##.'],
-                ['#..', '###', '...'],
-                ['.##', '.#.', '.#.']],
-          'L': [['...', '###', '#..'],
-                ['##.', '.#.', '.#.'],
-                ['..#', '###', '...'],
-                ['.#.', '.#.', '.##']],
-          'O': [['....', '.##.', '.##.', '....']],
-          'S': [['...', '.##', '##.'],
-                ['.#.', '.##', '..#']],
-          'T': [['...', '###', '.#.'],
-                ['.#.', '##.', '.#.'],
-                ['.#.', '###', '...'],
-                ['.#.', '.##', '.#.']],
-          'Z': [['...', '##.', '.##'],
-                ['..#', '.##', '.#.']]}
-
-
-class Piece(object):
-    """ tetromino class """
-    __slots__ = ('x', 'y', 'shape', 'rotation', 'color')
-    
-    def __init__(self):
-        self.x, self.y = 14, 10  # top left position in blocks
-        self.shape = random.choice(list(SHAPES))  # returns a random shape
-        self.rotation = 0  # current rotation
-        self.color = WHITE  # color
-
-    def get_template(self):
-        """ returns the template to render """
-        template = SHAPES[self.shape][self.rotation]
-        size = list(range(len(template)))
-        yield from [(self.x + x, self.y + y)
-                    for y in size for x in size if template[y][x] == '#']
-
-    def move(self, x, y):
-        self.x += x
-        self.y += y
-
-    def rotate(self, rotation):
-        self.rotation = (self.rotation + rotation) % len(SHAPES[self.shape])
-
-    def hold(self):
-        """ puts the piece in the holding area """
-        self.x, self.y = 14, 16
-        self.rotation = 0
-
-    def reset(self):
-        """ sets the piece to enter by the top """
-        self.x, self.y = 3, -3
-        self.rotation = 0
-
-    def render(self, console):
-        for (x, y) in self.get_template():
-            if y >= 0:
-                pygame.draw.rect(console, self.color, (scale(8 + shift(x)),
-                                                       scale(8 + shift(y)),
-                                                       scale(6),
-                                                       scale(6)))
-
-
-class Board(object):
-    """ board class """
-    __slots__ = ('x', 'y', 'w', 'h', 'grid', 'pieces',
-                 'hold', 'level', 'score', 'fall_speed',
-                 'last_fall_time', 'last_move_time', 'last_update')
-    
-    def __init__(self, x, y, w, h):
-        self.x, self.y = x, y  # top left position in pixels
-        self.w, self.h = w, h  # height and width in blocks
-
-        # make an empty board
-        self.grid = [[None for _ in range(w)] for _ in range(h)]
-        # [current piece, next piece, held piece, ghost piece]
-        self.pieces = [None, Piece(), None, None]
-        self.get_next_piece()
-        self.get_ghost()
-        self.hold = True  # allow holding
-
-        self.level, self.score = 0, 0
-        self.fall_speed = 0.5
-        self.last_fall_time = time.time()
-        self.last_move_time = time.time()
-        self.last_update = time.time()
-
-    def drop_piece(self):
-        """ drops the piece to it's ghost's position """
-        self.last_update = time.time()
-        self.pieces[0].x, self.pieces[0].y = self.pieces[3].x, self.pieces[3].y
-        
-    def hold_piece(self):
-        """ assigns the piece to holding area """
-        if self.pieces[2]:
-            self.pieces[0], self.pieces[2] = self.pieces[2], self.pieces[0]
-        else:
-            self.pieces[:3] = [self.pieces[1], Piece(), self.pieces[0]]
-
-        self.pieces[0].reset()
-        self.pieces[2].hold()
-        self.hold = False
-
-    def get_ghost(self):
-        """ shows where the piece will fall """
-        self.pieces[3] = copy.deepcopy(self.pieces[0])
-        self.pieces[3].color = GRAY
-        
-        while self.is_valid_position(self.pieces[3]):
-            self.pieces[3].y += 1
-        self.pieces[3].y -= 1
-
-    def get_next_piece(self):
-        self.pieces[0], self.pieces[1] = self.pieces[1], Piece()
-        self.pieces[0].reset()  # starting position of the current piece
-
-    def set_piece(self):
-        """ sets the piece inplace on the board """
-        for (x, y) in self.pieces[0].get_template():
-            self.grid[y][x] = self.pieces[0].color
-
-        self.score += 10
-        self.get_next_piece()
-
-    def is_valid_position(self, piece):
-        """ checks if the piece is in a valid position on the board """
-        for (x, y) in piece.get_template():
-            if x < 0 or x > 9 or y > 19 or \
-                    (0 <= x <= 9 and 0 <= y <= 19 and self.grid[y][x]):
-                return False
-        return True
-
-    def move_piece(self, x, y):
-        self.pieces[0].move(x, y)
-        if self.is_valid_position(self.pieces[0]):
-            self.last_move_time = self.last_update = time.time()
-        else:
-            self.pieces[0].move(-x, -y)
-                
-    def rotate_piece(self, rotation):
-        self.pieces[0].rotate(rotation)
-        if not self.is_valid_position(self.pieces[0]):
-            self.pieces[0].rotate(-rotation)
-
-    def update(self, inputs):
-        """ updates the board """
-        if inputs.move_left and time.time() - self.last_move_time > 0.075:
-            self.move_piece(-1, 0)
-        elif inputs.move_right and time.time() - self.last_move_time > 0.075:
-            self.move_piece(1, 0)
-        elif inputs.move_down and time.time() - self.last_move_time > 0.075:
-            self.move_piece(0, 1)
-        elif inputs.drop:
-            self.drop_piece()
-            inputs.drop = False
-
-        if inputs.rotate_left:
-            self.rotate_piece(-1)
-            inputs.rotate_left = False
-        elif inputs.rotate_right:
-            self.rotate_piece(1)
-            inputs.rotate_right = False
-            
-        if inputs.hold and self.hold:
-            self.hold_piece()
-            inputs.hold = False
-
-        if time.time() - self.last_fall_time > self.fall_speed:
-            self.last_fall_time = time.time()
-            self.move_piece(0, 1)
-
-        if time.time() - self.last_update > 0.08:
-            self.last_update = time.time()
-            if (self.pieces[0].x, self.pieces[0].y) == \
-                    (self.pieces[3].x, self.pieces[3].y):
-                self.set_piece()
-                inputs.reset()
-                self.hold = True
-                
-        lines_cleared = 0
-        for row in reversed(range(self.h)):
-            while None not in self.grid[row]:
-                self.grid[1:row + 1] = self.grid[:row]
-                self.grid[0] = [None] * self.w
-                lines_cleared += 1
-
-        if lines_cleared:
-            # update the score
-            self.score += MULTIPLIER[lines_cleared] * (self.level + 1)
-
-        if self.level < 30:
-            self.level = self.score // 1000  # update the level
-            # update the falling speed of the pieces
-            self.fall_speed = 0.5 - self.level * 0.015
-
-        self.get_ghost()
-
-    def render(self, console):
-        # render the border
-        pygame.draw.rect(console, WHITE, (scale(self.x - 2),
-                                          scale(self.y - 2),
-                                          scale(8 * self.w + 4),
-                                          scale(8 * self.h + 4)),
-                         scale(1))
-
-        # render the board
-        for y in range(self.h):
-            for x in range(self.w):
-                if self.grid[y][x]:
-                    pygame.draw.rect(console, self.grid[y][x],
-                                     (scale(self.x + shift(x)),
-                                      scale(self.y + shift(y)),
-                                      scale(6),
-                                      scale(6)))
-                    
-        # render the pieces
-        for piece in reversed(self.pieces):
-            if piece:
-                piece.render(console)
 
 
 class Text(pygame.Rect):
@@ -262,42 +40,190 @@ class Text(pygame.Rect):
 
 class Gui(object):
     """ gui class """
-    __slots__ = 'texts'
+    __slots__ = ('labels', 'texts', 'values', 'dirty')
     
     def __init__(self):
-        # level text
-        self.texts = [Text('Level 0', scale(8), scale(136), scale(16), WHITE)]
-
-        # score text
-        self.texts.append(Text('Score', scale(8), scale(136), scale(40), WHITE))
-        self.texts.append(Text('0', scale(8), scale(136), scale(56), WHITE))
+        # static score/next/hold piece text
+        self.labels = [Text('Score', 8, 136, 40, WHITE),
+                       Text('Next', 8, 136, 80, WHITE),
+                       Text('Hold', 8, 136, 128, WHITE)]
 
-        # next/hold piece text
-        self.texts.append(Text('Next', scale(8), scale(136), scale(80), WHITE))
-        self.texts.append(Text('Hold', scale(8), scale(136), scale(128), WHITE))
+        # level and score text
+        self.texts = [Text('Level 0', 8, 136, 16, WHITE),
+                      Text('0', 8, 136, 56, WHITE)]
+        self.values = [0, 0]
+        self.dirty = []  # rects of the texts that have changed
 
     def update(self, level, score):
-        self.texts[0].update('Level ' + str(level))  # update level
-        self.texts[2].update(str(score))  # update score
+        for (i, value, text) in ((0, level, 'Level ' + str(level)),
+                                 (1, score, str(score))):
+            if self.values[i] != value:  # only re-render changed text
+                self.values[i] = value
+                self.dirty.append(self.texts[i].copy())
+                self.texts[i].update(text)
+                self.dirty.append(self.texts[i].copy())
+
+
+class Renderer(object):
+    """ renderer class drawing the screen at its native resolution, caching
+        its static layers, and scaling only the changed rects up to the
+        window, which keeps the rest of the last frame """
+    __slots__ = ('console', 'scale', 'screen', 'background', 'static',
+                 'sprites', 'dests', 'n_pieces', 'grid', 'keys', 'rects')
+
+    def __init__(self, console, gui):
+        self.console = console
+        self.scale = console.get_width() // WIN_WIDTH
+        self.screen = pygame.Surface((WIN_WIDTH, WIN_HEIGHT), 0, console)
+        self.background = self.screen.copy()  # border and labels
+        self.static = self.screen.copy()  # background and set pieces
+        self.sprites = {}  # pre-rendered blocks of each colour
+        self.dests = []  # positions of the blocks of the board
+        self.n_pieces = None  # number of pieces set on the static layer
+        self.grid = None  # rows of the board set on the static layer
+        self.keys = []  # positions of the pieces drawn in the last frame
+        self.rects = []  # rects they cover
+
+        self.background.fill(BLACK)
+        for text in gui.labels:
+            self.background.blit(text.surface, text)
+
+    def reset(self, board):
+        """ renders the border of a new board and redraws everything """
+        pygame.draw.rect(self.background, WHITE, (board.x - 2,
+                                                  board.y - 2,
+                                                  8 * board.w + 4,
+                                                  8 * board.h + 4), 1)
+        self.dests = [[(board.x + shift(x), board.y + shift(y))
+                       for x in range(board.w)] for y in range(board.h)]
+        self.n_pieces = self.grid = None
+
+    def get_sprite(self, color):
+        """ returns the pre-rendered block of a colour """
+        sprite = self.sprites.get(color)
+        if sprite is None:
+            sprite = self.sprites[color] = pygame.Surface((6, 6), 0,
+                                                          self.screen)
+            sprite.fill(color)
+        return sprite
+
+    def render_stack(self, board):
+        """ renders the set pieces onto the static layer, and returns the
+            rects of the rows that have changed """
+        get_sprite = self.get_sprite
+        blits = [(self.background, (0, 0))]
+        for (row, dests) in zip(board.grid, self.dests):
+            blits += [(get_sprite(color), dest)
+                      for (color, dest) in zip(row, dests) if color]
+        self.static.blits(blits, False)
+        self.n_pieces = board.n_pieces
+
+        dirty = []
+        for (y, row) in enumerate(board.grid):
+            if self.grid is None or row != self.grid[y]:
+                rect = pygame.Rect(board.x, board.y + 8 * y, 8 * board.w, 8)
+                if dirty and dirty[-1].bottom == rect.top:  # merge runs
+                    dirty[-1].union_ip(rect)
+                else:
+                    dirty.append(rect)
+        self.grid = [list(row) for row in board.grid]
+        return dirty
+
+    def get_blits(self, piece):
+        """ returns the blits of the blocks of a piece """
+        sprite = self.get_sprite(piece.color)
+        return [(sprite, (8 + shift(x), 8 + shift(y)))
+                for (x, y) in piece.get_template() if y >= 0]
+
+    @staticmethod
+    def get_rect(piece):
+        """ returns the rect a piece covers """
+        min_x, min_y, max_x, max_y = BOUNDS[piece.shape, piece.rotation]
+        return pygame.Rect(8 + shift(piece.x + min_x),
+                           8 + shift(piece.y + min_y),
+                           8 * (max_x - min_x) + 6,
+                           8 * (max_y - min_y) + 6)
+
+    def present(self, dirty):
+        """ scales the dirty rects of the screen up to the window, so the
+            cost grows with the area that has changed """
+        scale, bounds = self.scale, self.screen.get_rect()
+        updated = []
+        for rect in dirty:
+            rect = rect.clip(bounds)
+            if rect:
+                target = pygame.Rect(rect.x * scale, rect.y * scale,
+                                     rect.w * scale, rect.h * scale)
+                pygame.transform.scale(self.screen.subsurface(rect),
+                                       target.size,
+                                       self.console.subsurface(target))
+                updated.append(target)
+        pygame.display.update(updated)
+
+    def render(self, board, gui):
+        """ renders the changes since the last frame """
+        screen = self.screen
+        pieces = board.pieces[::-1]  # in drawing order
+        keys = [piece and (piece.shape, piece.rotation, piece.x, piece.y)
+                for piece in pieces]
+        rects = [piece and self.get_rect(piece) for piece in pieces]
+
+        if board.n_pieces != self.n_pieces:  # the stack has changed
+            new = self.n_pieces is None
+            rows = self.render_stack(board)
+            if new:  # a new board
+                dirty = [screen.get_rect()]
+            else:  # the changed rows and the pieces drawn in the last frame
+                dirty = rows + [rect for rect in self.rects if rect]
+            blits = [(self.static, (0, 0))]
+            texts = gui.texts  # the static layer has covered them
+            redraw = [True] * len(pieces)
+        else:
+            # redraw the pieces that have moved and those they overlap
+            redraw = [key != old for (key, old) in zip(keys, self.keys)]
+            while True:
+                covered = gui.dirty + [rect for (i, rect) in
+                                       enumerate(self.rects + rects)
+                                       if rect and redraw[i % len(pieces)]]
+                overlapped = [i for (i, rect) in enumerate(rects)
+                              if rect and not redraw[i] and
+                              rect.collidelist(covered) != -1]
+                if not overlapped:
+                    break
+                for i in overlapped:
+                    redraw[i] = True
+
+            # erase them
+            dirty = [rect for (i, rect) in enumerate(self.rects)
+                     if rect and redraw[i]]
+            blits = [(self.static, rect, rect) for rect in dirty]
+            texts = [text for text in gui.texts
+                     if text.collidelist(gui.dirty) != -1]
+
+        # render the changed text
+        blits += [(self.static, rect, rect) for rect in gui.dirty]
+        blits += [(text.surface, text) for text in texts]
+        dirty += gui.dirty
+        gui.dirty = []
 
-    def render(self, console):
-        for text in self.texts:
-            console.blit(text.surface, text)
+        # render the pieces
+        for (i, piece) in enumerate(pieces):
+            if piece and redraw[i]:
+                blits += self.get_blits(piece)
+                dirty.append(rects[i])
+        self.keys, self.rects = keys, rects
 
+        screen.blits(blits, False)  # in a single call
+        self.present(dirty)
 
-class EventHandler(object):
+
+class EventHandler(Inputs):
     """ event handling class """
-    __slots__ = ('move_left', 'move_right', 'move_down',
-                 'rotate_left', 'rotate_right', 'drop', 'hold')
-    
+    __slots__ = ('rewind',)
+
     def __init__(self):
-        self.move_left = False
-        self.move_right = False
-        self.move_down = False
-        self.rotate_left = False
-        self.rotate_right = False
-        self.drop = False
-        self.hold = False
+        super().__init__()
+        self.rewind = False  # held to rewind the game
 
     def get_events(self):
         check_for_quit()
@@ -314,6 +240,8 @@ class EventHandler(object):
                     self.drop = True
                 elif event.key == K_x:
                     self.hold = True
+                elif event.key == K_r:
+                    self.rewind = True
 
                 if event.key == K_z:
                     self.rotate_left = True
@@ -331,64 +259,84 @@ class EventHandler(object):
                     self.drop = False
                 elif event.key == K_x:
                     self.hold = False
+                elif event.key == K_r:
+                    self.rewind = False
                 elif event.key == K_z:
                     self.rotate_left = False
                 elif event.key in (K_c, K_UP):
                     self.rotate_right = False
-                    
-    def reset(self):
-        self.move_left = False
-        self.move_right = False
-        self.move_down = False
-        self.rotate_left = False
-        self.rotate_right = False
-        self.drop = False
-        self.hold = False
 
 
 class Engine(object):
     """ game engine class """
-    __slots__ = ('console', 'event_handler', 'fps_clock',
-                 'gui', 'state', 'board')
+    __slots__ = ('console', 'event_handler', 'fps_clock', 'gui', 'renderer',
+                 'state', 'board', 'board_class', 'bot', 'log', 'speed',
+                 'rewind')
     
-    def __init__(self):
+    def __init__(self, board_class=BitBoard, bot=False, log=None, speed=1,
+                 scale=SCALE, rewind=0):
         pygame.init()
         pygame.display.set_caption('Tetris')
-        self.console = pygame.display.set_mode((scale(WIN_WIDTH),
-                                                scale(WIN_HEIGHT)))
+        self.console = pygame.display.set_mode((WIN_WIDTH * scale,
+                                                WIN_HEIGHT * scale))
         self.event_handler = EventHandler()
         self.fps_clock = pygame.time.Clock()
         self.gui = Gui()
+        self.renderer = Renderer(self.console, self.gui)
         
         self.state = 'new'
         self.board = None
-
-    def init(self):
+        self.board_class = board_class
+        self.bot = Bot() if bot else None  # plays instead of the keyboard
+        self.log = log  # records the inputs of each tick
+        self.speed = speed  # multiple of the tick rate
+        # snapshots of the last seconds of the game
+        self.rewind = Rewind(10, 20, rewind) if rewind else None
+
+    def init(self, seed=None):
         """ initialises a new game """
         self.state = 'playing'
-        self.board = Board(8, 8, 10, 20)
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.board = self.board_class(8, 8, 10, 20, seed)
+        self.renderer.reset(self.board)
+        if self.log is not None:
+            self.log.start(seed)
+        if self.rewind is not None:
+            self.rewind.clear()
+        if self.bot:
+            self.bot = Bot(self.bot.weights, self.bot.use_hold)
         
-    def update(self):
+    def update(self, inputs=None):
         # update the board, score and level
         self.event_handler.get_events()
-        self.board.update(self.event_handler)
-
-        for x in range(self.board.w):
-            if self.board.grid[0][x]:  # pieces have hit the top of the screen
-                self.state = 'new'  # reset abruptly
+        if inputs is None and self.rewind is not None and \
+                self.event_handler.rewind:
+            # step back a tick instead
+            if self.rewind.pop(self.board) and self.log is not None:
+                self.log.unrecord()
+        else:
+            if inputs is None:  # unless replaying
+                inputs = self.event_handler
+                if self.bot:
+                    self.bot.update(self.board)
+                    inputs = self.bot
+            if self.rewind is not None:
+                self.rewind.push(self.board)
+            if self.log is not None:
+                self.log.record(inputs)
+            self.board.update(inputs)
+
+        if self.board.is_topped_out():
+            self.state = 'new'  # reset abruptly
             
         # update GUI
         self.gui.update(self.board.level, self.board.score)
         
-        self.fps_clock.tick(60)
+        self.fps_clock.tick(TICK_RATE * self.speed)
 
     def render(self):
-        self.console.fill(BLACK)
-
-        self.gui.render(self.console)
-        self.board.render(self.console)
-
-        pygame.display.update()
+        self.renderer.render(self.board, self.gui)
 
 
 def check_for_quit():
@@ -405,11 +353,6 @@ def terminate():
     sys.exit()
 
 
-def scale(x):
-    """ scales the window """
-    return x * SCALE
-    
-    
 def shift(x):
     """ aligns the toft left position """
     return 8 * x + 1
@@ -421,16 +364,67 @@ if __name__ == '__main__':
                      [Right] →
                      [Down] ↓
                      [Drop] / Space
-                     [Hold] Z"""
+                     [Hold] Z
+                     [Rewind] R"""
     parser = ArgumentParser(description=description)
+    parser.add_argument('--grid', action='store_true',
+                        help="use the list-of-lists board instead of bitboards")
+    parser.add_argument('--seed', default=None, type=int,
+                        help="seed for a deterministic sequence of pieces")
+    parser.add_argument('--bot', action='store_true',
+                        help="let the placement-search bot play")
+    parser.add_argument('--record', default=None, metavar='LOG',
+                        help="record the inputs of the session to a log")
+    parser.add_argument('--replay', default=None, metavar='LOG',
+                        help="replay the session recorded in a log")
+    parser.add_argument('--scale', default=SCALE, type=int,
+                        help="integer scale of the window; default is {}"
+                             .format(SCALE))
+    parser.add_argument('--rewind', default=10, type=float, metavar='SECONDS',
+                        help="seconds of play kept to rewind; default is 10")
+    parser.add_argument('--speed', default=1, type=float,
+                        help="speed multiplier of the replay; "
+                             "0 re-simulates it headless at full speed")
     args = parser.parse_args()
 
-    engine = Engine()
+    random.seed(args.seed)
+    board_class = Board if args.grid else BitBoard
+
+    if args.replay and args.speed == 0:
+        log = Log.load(args.replay)
+        for game in range(len(log.games)):
+            start = time.perf_counter()
+            board = simulate(log, game, board_class)
+            elapsed = time.perf_counter() - start
+            print("[Game {}] score {} level {} pieces {} "
+                  "({} ticks at {:,.0f} ticks/s)".format(
+                      game + 1, board.score, board.level, board.n_pieces,
+                      board.tick, board.tick / elapsed))
+        sys.exit()
+
+    if args.replay:
+        log = Log.load(args.replay)
+        engine = Engine(board_class, speed=args.speed, scale=args.scale)
+        inputs = Inputs()
+        for (game, (seed, _)) in enumerate(log.games):
+            engine.init(seed)
+            for bits in log.get_ticks(game):
+                inputs.set_bits(bits)
+                engine.update(inputs)
+                engine.render()
+        terminate()
 
-    while True:
-        if engine.state == 'new':
-            engine.init()
-            
-        engine.update()
-        engine.render()
+    engine = Engine(board_class, args.bot, Log() if args.record else None,
+                    scale=args.scale, rewind=args.rewind)
+
+    try:
+        while True:
+            if engine.state == 'new':
+                engine.init()
+                
+            engine.update()
+            engine.render()
+    finally:
+        if args.record:
+            engine.log.save(args.record)
 
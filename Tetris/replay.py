@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+""" compact input logs of TETRIS sessions and their re-simulation """
+
+from core import *
+import struct
+import zlib
+
+MAGIC = b'TETRISLOG1'
+
+
+def write_varint(out, value):
+    """ appends an unsigned integer as a LEB128 varint """
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, i):
+    """ returns the LEB128 varint at data[i] and the index after it """
+    value = shift = 0
+    while True:
+        byte = data[i]
+        value |= (byte & 0x7f) << shift
+        i += 1
+        if byte < 0x80:
+            return value, i
+        shift += 7
+
+
+class Log(object):
+    """ input log of a session: the seed of each game and the bitfield of
+        inputs held on each tick, as runs of unchanged bitfields """
+    __slots__ = ('games',)
+
+    def __init__(self):
+        self.games = []  # [seed, [[bits, ticks], ...]] of each game
+
+    def start(self, seed):
+        """ starts logging a new game """
+        self.games.append([seed, []])
+
+    def record(self, inputs):
+        """ logs the inputs of a tick """
+        bits, runs = inputs.get_bits(), self.games[-1][1]
+        if runs and runs[-1][0] == bits:
+            runs[-1][1] += 1
+        else:
+            runs.append([bits, 1])
+
+    def unrecord(self):
+        """ drops the inputs of the last tick, when it has been rewound """
+        runs = self.games[-1][1]
+        runs[-1][1] -= 1
+        if not runs[-1][1]:
+            runs.pop()
+
+    def get_ticks(self, game):
+        """ yields the bitfield of each tick of a game """
+        for (bits, ticks) in self.games[game][1]:
+            for _ in range(ticks):
+                yield bits
+
+    def dumps(self):
+        """ returns the log as bytes; each run is stored as the xor of its
+            bitfield with the previous one and its length """
+        out = bytearray()
+        write_varint(out, len(self.games))
+        for (seed, runs) in self.games:
+            out += struct.pack('<Q', seed)
+            write_varint(out, len(runs))
+            prev = 0
+            for (bits, ticks) in runs:
+                out.append(bits ^ prev)
+                write_varint(out, ticks)
+                prev = bits
+        return MAGIC + zlib.compress(bytes(out), 9)
+
+    @classmethod
+    def loads(cls, data):
+        """ returns the log stored in bytes """
+        assert data.startswith(MAGIC), "not a TETRIS input log"
+        data = zlib.decompress(data[len(MAGIC):])
+
+        log = cls()
+        n_games, i = read_varint(data, 0)
+        for _ in range(n_games):
+            log.start(struct.unpack_from('<Q', data, i)[0])
+            n_runs, i = read_varint(data, i + 8)
+            bits = 0
+            for _ in range(n_runs):
+                bits ^= data[i]
+                ticks, i = read_varint(data, i + 1)
+                log.games[-1][1].append([bits, ticks])
+        return log
+
+    def save(self, path):
+        with open(path, 'wb') as fo:
+            fo.write(self.dumps())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as fi:
+            return cls.loads(fi.read())
+
+
+def simulate(log, game, board_class=BitBoard):
+    """ re-simulates a logged game headlessly and returns its board """
+    board = board_class(8, 8, 10, 20, log.games[game][0])
+    inputs = Inputs()
+    for bits in log.get_ticks(game):
+        inputs.set_bits(bits)
+        board.update(inputs)
+    return board
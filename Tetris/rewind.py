@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+""" rewinding of TETRIS games from a ring buffer of compact snapshots """
+
+from core import *
+import struct
+
+# seed, tick, last fall, move and update ticks, pieces set, score, lines,
+# level, fall speed, hold allowed, the (shape, colour) of the current, next
+# and held pieces, the rotation and position of the current piece, and the
+# position of the ghost; the packed grid follows
+HEADER = struct.Struct('<QIIIIIqIHh?BBBBBBBbbbb')
+SHAPE_INDEX = {shape: i for (i, shape) in enumerate(NAMES)}
+NO_PIECE = 0xff
+
+
+class Rewind(object):
+    """ ring buffer of the snapshots of a board on the last ticks, with its
+        memory allocated up front """
+    __slots__ = ('size', 'capacity', 'buffer', 'head', 'count',
+                 'colors', 'palette', 'grid', 'n_pieces')
+
+    def __init__(self, w=10, h=20, seconds=10):
+        self.size = HEADER.size + w * h  # bytes per snapshot
+        self.capacity = max(1, int(seconds * TICK_RATE))  # snapshots held
+        self.buffer = bytearray(self.size * self.capacity)
+        self.colors = [None]  # colours of the blocks by index
+        self.palette = {None: 0}  # indices of the colours
+        self.clear()
+
+    def clear(self):
+        """ forgets every snapshot """
+        self.head = 0  # index of the next snapshot
+        self.count = 0  # number of snapshots held
+        self.grid = None  # packed grid of the board
+        self.n_pieces = None  # number of pieces set on it
+
+    def get_index(self, color):
+        """ returns the index of a colour, adding it to the palette """
+        index = self.palette.get(color)
+        if index is None:
+            index = self.palette[color] = len(self.colors)
+            self.colors.append(color)
+        return index
+
+    def push(self, board):
+        """ snapshots a board, overwriting the oldest snapshot when full """
+        get_index = self.get_index
+        if board.n_pieces != self.n_pieces:  # the grid only changes on locks
+            self.grid = bytes([get_index(color)
+                               for row in board.grid for color in row])
+            self.n_pieces = board.n_pieces
+
+        piece, next_piece, held, ghost = board.pieces
+        offset = self.head * self.size
+        HEADER.pack_into(self.buffer, offset, board.seed, board.tick,
+                         board.last_fall_tick, board.last_move_tick,
+                         board.last_update_tick, board.n_pieces, board.score,
+                         board.lines, board.level, board.fall_speed,
+                         board.hold,
+                         SHAPE_INDEX[piece.shape], get_index(piece.color),
+                         SHAPE_INDEX[next_piece.shape],
+                         get_index(next_piece.color),
+                         SHAPE_INDEX[held.shape] if held else NO_PIECE,
+                         get_index(held.color) if held else 0,
+                         piece.rotation, piece.x, piece.y, ghost.x, ghost.y)
+        self.buffer[offset + HEADER.size:offset + self.size] = self.grid
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def pop(self, board):
+        """ restores the last snapshot onto a board and drops it; returns
+            False when there is none left """
+        if not self.count:
+            return False
+        self.head = (self.head - 1) % self.capacity
+        self.count -= 1
+
+        offset = self.head * self.size
+        (board.seed, board.tick, board.last_fall_tick, board.last_move_tick,
+         board.last_update_tick, n_pieces, board.score, board.lines,
+         board.level, board.fall_speed, board.hold, shape, color, next_shape,
+         next_color, held_shape, held_color, rotation, x, y, ghost_x,
+         ghost_y) = \
+            HEADER.unpack_from(self.buffer, offset)
+
+        if n_pieces != board.n_pieces:  # otherwise the grid is the same
+            grid = self.buffer[offset + HEADER.size:offset + self.size]
+            colors, w = self.colors, board.w
+            board.set_grid([[colors[i] for i in grid[start:start + w]]
+                            for start in range(0, len(grid), w)])
+            board.n_pieces = n_pieces
+            self.grid, self.n_pieces = bytes(grid), n_pieces
+
+        piece = board.pieces[0] = Piece(NAMES[shape], self.colors[color])
+        piece.rotation, piece.x, piece.y = rotation, x, y
+        board.pieces[1] = Piece(NAMES[next_shape], self.colors[next_color])
+        if held_shape == NO_PIECE:
+            board.pieces[2] = None
+        else:
+            board.pieces[2] = Piece(NAMES[held_shape], self.colors[held_color])
+            board.pieces[2].hold()
+        ghost = board.pieces[3]
+        ghost.shape, ghost.rotation = piece.shape, piece.rotation
+        ghost.x, ghost.y = ghost_x, ghost_y
+        return True
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+""" tests of the batch of TETRIS boards, run with pytest """
+
+from ai import search
+from core import *
+from vecenv import VecBoards
+import random
+
+
+def test_vec_boards(n=64, steps=200, seed=0):
+    """ checks a batch of boards against scalar boards placing the same
+        pieces """
+    rng = random.Random(seed)
+    seeds = [rng.getrandbits(64) for _ in range(n)]
+    vec = VecBoards(len(seeds), seeds=seeds)
+    boards = [BitBoard(8, 8, 10, 20, s) for s in seeds]
+    for _ in range(steps):
+        actions = []
+        for board in boards:
+            placement = None if board.is_topped_out() else \
+                search(board, use_hold=False)[0]
+            if placement is None or rng.random() < 0.1:  # a random placement
+                placement = (False, rng.randrange(4), rng.randint(-3, 10))
+            actions.append(placement[1:])
+
+        vec.step(*zip(*actions))
+        for (i, board) in enumerate(boards):
+            if not board.is_topped_out():
+                rotation, x = actions[i]
+                board.place(rotation % len(SHAPES[board.pieces[0].shape]), x)
+            assert list(vec.rows[i, WALL:WALL + 20]) == board.rows[:20]
+            assert (vec.scores[i], vec.levels[i], vec.over[i]) == \
+                (board.score, board.level, board.is_topped_out())
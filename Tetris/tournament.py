@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+""" headless self-play tournaments of TETRIS bots over a process pool """
+
+from ai import search
+from argparse import ArgumentParser
+from core import *
+from multiprocessing import Pool
+import csv
+import importlib
+import json
+import os
+import random
+import time
+
+FIELDS = ['policy', 'game', 'seed', 'score', 'lines', 'level', 'pieces',
+          'ms_per_move']
+
+
+def bot(board):
+    """ plays the best placement found by the search, with holding """
+    return search(board)[0]
+
+
+def bot_no_hold(board):
+    """ plays the best placement found by the search, without holding """
+    return search(board, use_hold=False)[0]
+
+
+def random_placement(board):
+    """ plays a random placement """
+    return False, random.randrange(4), random.randrange(-2, board.w)
+
+
+# policies by name; others are given as 'module:function'
+POLICIES = {'bot': bot, 'bot_no_hold': bot_no_hold, 'random': random_placement}
+loaded = {}  # policies loaded by each worker
+
+
+def get_policy(name):
+    """ returns a policy, a function from a board to the (hold, rotation, x)
+        placement of its current piece, or None to resign """
+    if name in POLICIES:
+        return POLICIES[name]
+    if name not in loaded:
+        module, _, function = name.partition(':')
+        loaded[name] = getattr(importlib.import_module(module), function)
+    return loaded[name]
+
+
+def play(task):
+    """ plays a game and returns its results """
+    name, game, seed, max_pieces = task
+    policy = get_policy(name)
+    random.seed(seed)  # for policies that draw random numbers
+    board = BitBoard(8, 8, 10, 20, seed)
+
+    elapsed = 0
+    while board.n_pieces < max_pieces and not board.is_topped_out():
+        start = time.perf_counter()
+        placement = policy(board)
+        elapsed += time.perf_counter() - start
+        if placement is None:
+            break
+
+        hold, rotation, x = placement
+        if hold and board.hold:
+            board.hold_piece()
+        board.place(rotation, x)
+
+    return {'policy': name, 'game': game, 'seed': seed,
+            'score': board.score, 'lines': board.lines,
+            'level': board.level, 'pieces': board.n_pieces,
+            'ms_per_move': round(elapsed / max(board.n_pieces, 1) * 1e3, 4)}
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--games', default=100, type=int,
+                        help="number of games per policy; default is 100")
+    parser.add_argument('-p', '--policy', action='append',
+                        help="policy to play, by name ({}) or as "
+                             "'module:function'; may be repeated to play "
+                             "each on the same seeds; default is bot"
+                             .format(', '.join(POLICIES)))
+    parser.add_argument('--seed', default=0, type=int,
+                        help="seed of the seeds of the games; default is 0")
+    parser.add_argument('--pieces', default=1000, type=int,
+                        help="pieces after which a game stops; "
+                             "default is 1000")
+    parser.add_argument('-j', '--processes', default=os.cpu_count(), type=int,
+                        help="number of worker processes; default is the "
+                             "number of cores")
+    parser.add_argument('-o', '--output', default='results.jsonl',
+                        help="file the results are streamed to, as CSV if it "
+                             "ends in .csv and JSON lines otherwise; "
+                             "default is results.jsonl")
+    args = parser.parse_args()
+
+    policies = args.policy or ['bot']
+    rng = random.Random(args.seed)
+    seeds = [rng.getrandbits(64) for _ in range(args.games)]
+    tasks = [(name, game, seed, args.pieces)
+             for (game, seed) in enumerate(seeds) for name in policies]
+
+    totals = {name: [0, 0, 0] for name in policies}  # games, score, lines
+    start = time.perf_counter()
+    with Pool(args.processes) as pool, open(args.output, 'w', newline='') as fo:
+        if args.output.endswith('.csv'):
+            writer = csv.DictWriter(fo, FIELDS)
+            writer.writeheader()
+            write = writer.writerow
+        else:
+            def write(result):
+                fo.write(json.dumps(result) + '\n')
+
+        chunksize = max(1, len(tasks) // (args.processes * 32))
+        for result in pool.imap_unordered(play, tasks, chunksize):
+            write(result)
+            fo.flush()
+            total = totals[result['policy']]
+            total[0] += 1
+            total[1] += result['score']
+            total[2] += result['lines']
+    elapsed = time.perf_counter() - start
+
+    for (name, (games, score, lines)) in totals.items():
+        print("{:<16} {:>6} games {:>12,.1f} score {:>10,.1f} lines".format(
+              name, games, score / games, lines / games))
+    print("{} games in {:.1f}s on {} processes".format(
+          len(tasks), elapsed, args.processes))
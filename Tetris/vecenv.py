@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+""" a batch of TETRIS boards stepped together with numpy """
+
+from core import *
+import numpy as np
+
+N_ROTATIONS = 4  # rotations of an action, taken modulo those of the shape
+
+# (shape, rotation, template row) bitmasks, for the shapes in NAMES order
+TEMPLATES = np.zeros((len(NAMES), N_ROTATIONS, 4), dtype=np.uint32)
+for (i, shape) in enumerate(NAMES):
+    for rotation in range(N_ROTATIONS):
+        for (y, mask) in MASKS[shape, rotation % len(SHAPES[shape])]:
+            TEMPLATES[i, rotation, y] = mask
+
+# the rotations of each shape
+ROTATIONS = np.array([len(SHAPES[shape]) for shape in NAMES])
+
+# score for the number of lines cleared
+SCORES = np.array([0] + [MULTIPLIER[i] for i in range(1, 5)], dtype=np.int64)
+
+
+class VecBoards(object):
+    """ n boards, each stored as h padded bitboard rows like BitBoard, with
+        WALL empty rows above the board and WALL full rows below it """
+    __slots__ = ('n', 'w', 'h', 'empty_row', 'full_row', 'rows',
+                 'shapes', 'next_shapes', 'seeds', 'scores', 'levels',
+                 'n_pieces', 'lines', 'over')
+
+    def __init__(self, n, w=10, h=20, seeds=None):
+        self.n, self.w, self.h = n, w, h
+        walls = (1 << WALL) - 1
+        self.empty_row = walls | walls << (w + WALL)
+        self.full_row = (1 << (w + 2 * WALL)) - 1
+
+        self.rows = np.empty((n, h + 2 * WALL), dtype=np.uint32)
+        self.shapes = np.empty(n, dtype=np.int64)  # current piece
+        self.next_shapes = np.empty(n, dtype=np.int64)  # next piece
+        self.seeds = np.empty(n, dtype=np.uint64)  # states of the generators
+        self.scores = np.empty(n, dtype=np.int64)
+        self.levels = np.empty(n, dtype=np.int64)
+        self.n_pieces = np.empty(n, dtype=np.int64)
+        self.lines = np.empty(n, dtype=np.int64)  # lines cleared by the step
+        self.over = np.empty(n, dtype=bool)  # the board has topped out
+
+        if seeds is None:
+            seeds = [random.getrandbits(64) for _ in range(n)]
+        self.reset(np.ones(n, dtype=bool), seeds)
+
+    def new_shapes(self, index):
+        """ returns the next shapes drawn by the generators of some boards,
+            in the same sequence as Board.new_piece """
+        with np.errstate(over='ignore'):
+            self.seeds[index] = self.seeds[index] * np.uint64(6364136223846793005) \
+                + np.uint64(1442695040888963407)
+        return ((self.seeds[index] >> np.uint64(32)) % np.uint64(len(NAMES))
+                ).astype(np.int64)
+
+    def reset(self, index, seeds):
+        """ starts new games on some boards """
+        self.rows[index, :WALL] = self.empty_row
+        self.rows[index, WALL:WALL + self.h] = self.empty_row
+        self.rows[index, WALL + self.h:] = self.full_row
+        self.seeds[index] = np.asarray(seeds, dtype=np.uint64)
+        self.next_shapes[index] = self.new_shapes(index)
+        self.shapes[index] = self.next_shapes[index]
+        self.next_shapes[index] = self.new_shapes(index)
+        self.scores[index] = 0
+        self.levels[index] = 0
+        self.n_pieces[index] = 0
+        self.lines[index] = 0
+        self.over[index] = False
+
+    def get_grids(self):
+        """ returns the (n, h, w) occupancy of the boards """
+        rows = self.rows[:, WALL:WALL + self.h, None]
+        return (rows >> (np.arange(self.w, dtype=np.uint32) + WALL)) & 1 == 1
+
+    def fits(self, index, rotations, xs, ys):
+        """ checks if the current pieces of some boards fit a position """
+        masks = TEMPLATES[self.shapes[index], rotations] << \
+            (xs + WALL).astype(np.uint32)[:, None]
+        rows = self.rows[index[:, None], ys[:, None] + WALL + np.arange(4)]
+        return ~(rows & masks).any(axis=1)
+
+    def step(self, rotations, xs):
+        """ places the current piece of every board that has not topped
+            out like Board.place, and returns the lines cleared """
+        index = np.flatnonzero(~self.over)
+        rotations = np.asarray(rotations)[index] % ROTATIONS[self.shapes[index]]
+        xs = np.asarray(xs)[index]
+        n = len(index)
+
+        # rotate right from the entry position until blocked
+        rotation = np.zeros(n, dtype=np.int64)
+        x, y = np.full(n, 3), np.full(n, -3)
+        for _ in range(N_ROTATIONS - 1):
+            turn = rotation < rotations
+            turn[turn] = self.fits(index[turn], rotation[turn] + 1,
+                                   x[turn], y[turn])
+            rotation += turn
+
+        # move sideways until blocked
+        for _ in range(self.w + 2):
+            dx = np.sign(xs - x)
+            move = dx != 0
+            move[move] = self.fits(index[move], rotation[move],
+                                   x[move] + dx[move], y[move])
+            if not move.any():
+                break
+            x += dx * move
+
+        # drop
+        fall = np.ones(n, dtype=bool)
+        while fall.any():
+            fall[fall] = self.fits(index[fall], rotation[fall],
+                                   x[fall], y[fall] + 1)
+            y += fall
+
+        # set the pieces; blocks above the board are lost
+        masks = TEMPLATES[self.shapes[index], rotation] << \
+            (x + WALL).astype(np.uint32)[:, None]
+        cells = (index[:, None], y[:, None] + WALL + np.arange(4))
+        self.rows[cells] |= masks
+        self.rows[index, :WALL] = self.empty_row
+        self.scores[index] += 10
+        self.n_pieces[index] += 1
+        self.shapes[index] = self.next_shapes[index]
+        self.next_shapes[index] = self.new_shapes(index)
+
+        # clear the full rows
+        board = self.rows[index, WALL:WALL + self.h]
+        full = board == self.full_row
+        lines = full.sum(axis=1)
+        cleared = np.flatnonzero(lines)
+        if len(cleared):
+            # full rows move to the top, keeping the order of the others
+            order = np.argsort(~full[cleared], axis=1, kind='stable')
+            board = np.take_along_axis(board[cleared], order, axis=1)
+            board[np.arange(self.h) < lines[cleared, None]] = self.empty_row
+            self.rows[index[cleared], WALL:WALL + self.h] = board
+        self.lines[:] = 0
+        self.lines[index] = lines
+
+        # update the score and level
+        levels = self.levels[index]
+        self.scores[index] += SCORES[lines] * (levels + 1)
+        self.levels[index] = np.where(levels < 30,
+                                      self.scores[index] // 1000, levels)
+
+        self.over[index] = self.rows[index, WALL] != self.empty_row
+        return self.lines